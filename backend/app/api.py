@@ -1,10 +1,22 @@
 """
 FastAPI Endpoints for Krida LungVision AI Service
 """
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Request, Header
 from fastapi.responses import JSONResponse
-from typing import List, Dict
-from .model_service import get_model_service
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+import hmac
+import os
+import numpy as np
+from .model_service import get_model_service, TTA_MODES
+from .model_registry import get_model_registry
+from .metrics import stage_metrics
+from .memory_profiler import memory_profiler
+from .serialization import render
+from .schemas import (
+    PredictResponse, CompactPredictResponse, BatchPredictResponse,
+    CompactBatchPredictResponse, PredictWithGradCAMResponse, GradCAMResponse
+)
 import logging
 
 router = APIRouter()
@@ -14,10 +26,138 @@ logger = logging.getLogger(__name__)
 ALLOWED_TYPES = {"image/jpeg", "image/jpg", "image/png"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
-@router.post("/predict", response_model=Dict)
+# Raw pixel ingest (/predict-raw)
+RAW_CONTENT_TYPE = "application/octet-stream"
+RAW_DTYPES = {"uint8": np.uint8, "uint16": np.uint16}
+RAW_LAYOUTS = {"HW", "HWC", "NHW", "NHWC"}
+MAX_RAW_SIZE = 64 * 1024 * 1024  # 64MB (a batch of decoded frames)
+MAX_RAW_BATCH = 32
+MIN_RAW_SIDE = 32
+MAX_RAW_SIDE = 4096
+
+# Response body forms: "full" (per-label objects) or "compact" (score vector
+# aligned with the `labels` of /api/model/info). Both honour Accept: application/msgpack.
+RESPONSE_FORMATS = ("full", "compact")
+MSGPACK_CONTENT = {"application/msgpack": {}}
+
+# Admin endpoints (model registry, memory debugging) are disabled unless a token is configured;
+# clients send it as X-Admin-Token. Model files must live under MODELS_DIR.
+ADMIN_TOKEN = os.getenv("LUNGVISION_ADMIN_TOKEN")
+MODELS_DIR = Path(os.getenv("LUNGVISION_MODELS_DIR", "models"))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency guarding admin endpoints with the LUNGVISION_ADMIN_TOKEN shared secret"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (set LUNGVISION_ADMIN_TOKEN)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+
+def _model_file(path: Optional[str]) -> Optional[str]:
+    """Resolve a model path, rejecting anything outside MODELS_DIR"""
+    if path is None:
+        return None
+    models_dir = MODELS_DIR.resolve()
+    resolved = (Path.cwd() / path).resolve()
+    if not resolved.is_relative_to(models_dir):
+        raise HTTPException(status_code=400, detail=f"Model files must be inside {MODELS_DIR}/")
+    return str(resolved)
+
+
+def _validate_format(response_format: str):
+    if response_format not in RESPONSE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid format. Allowed: {', '.join(RESPONSE_FORMATS)}"
+        )
+
+
+def _result_body(result: Dict, response_format: str) -> Dict:
+    """Response fields for one ModelService.analyze result"""
+    if response_format == "compact":
+        body = {
+            "scores": result["probabilities"],  # NumPy array, serialized natively
+            "urgency_tier": result["urgency_tier"],
+            "stage": result["stage"],
+        }
+        if result["tta_applied"]:
+            body["uncertainty"] = result["uncertainty"]
+        return body
+    return {
+        "predictions": result["predictions"],
+        "urgency_tier": result["urgency_tier"],  # Case-level urgency for triage
+        "stage": result["stage"],
+        "tta_applied": result["tta_applied"],
+        "uncertainty": result["uncertainty"],
+    }
+
+
+def _parse_raw_pixels(body: bytes, shape: str, dtype: str, layout: Optional[str]) -> Tuple[np.ndarray, bool]:
+    """
+    Zero-copy view of a raw pixel buffer as (N, H, W, C)
+    
+    Args:
+        body: Request body (C-order pixels, no header)
+        shape: Comma-separated dims, e.g. "512,512" or "4,512,512,3"
+        dtype: "uint8" or "uint16" (little-endian)
+        layout: "HW" | "HWC" | "NHW" | "NHWC" (default: HW for 2 dims, HWC for
+            3 dims ending in 1 or 3, NHW for other 3 dims, NHWC for 4 dims)
+    
+    Returns:
+        Tuple of (pixels (N, H, W, C), is_batch)
+    
+    Raises:
+        HTTPException 400 on any dtype/shape/length mismatch
+    """
+    if dtype not in RAW_DTYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid dtype. Allowed: {', '.join(RAW_DTYPES)}")
+    
+    try:
+        dims = tuple(int(d) for d in shape.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid shape '{shape}'. Expected e.g. '512,512'")
+    
+    if layout is None:
+        if len(dims) == 3:
+            layout = "HWC" if dims[2] in (1, 3) else "NHW"
+        else:
+            layout = {2: "HW", 4: "NHWC"}.get(len(dims))
+    if layout not in RAW_LAYOUTS or len(layout) != len(dims):
+        raise HTTPException(status_code=400, detail=f"Shape {dims} does not match layout {layout}")
+    
+    sizes = dict(zip(layout, dims))
+    n, h, w, c = sizes.get("N", 1), sizes["H"], sizes["W"], sizes.get("C", 1)
+    if not 1 <= n <= MAX_RAW_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch size must be between 1 and {MAX_RAW_BATCH}")
+    if not (MIN_RAW_SIDE <= h <= MAX_RAW_SIDE and MIN_RAW_SIDE <= w <= MAX_RAW_SIDE):
+        raise HTTPException(status_code=400, detail=f"Height/width must be between {MIN_RAW_SIDE} and {MAX_RAW_SIDE}")
+    if c not in (1, 3):
+        raise HTTPException(status_code=400, detail="Channels must be 1 (grayscale) or 3 (RGB)")
+    
+    np_dtype = np.dtype(RAW_DTYPES[dtype]).newbyteorder("<")
+    expected = n * h * w * c * np_dtype.itemsize
+    if len(body) != expected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Body is {len(body)} bytes, expected {expected} for shape {dims} {dtype}"
+        )
+    
+    # Zero-copy: a read-only view over the request body
+    return np.frombuffer(body, dtype=np_dtype).reshape(n, h, w, c), "N" in layout
+
+@router.post(
+    "/predict",
+    response_model=None,
+    responses={200: {"model": Union[PredictResponse, CompactPredictResponse], "content": MSGPACK_CONTENT}}
+)
 async def predict_xray(
+    request: Request,
     file: UploadFile = File(...),
-    threshold: float = 0.3  # Lower threshold to show more predictions
+    threshold: float = 0.3,  # Lower threshold to show more predictions
+    cascade: Optional[bool] = None,
+    tta: str = "off",
+    format: str = "full"
 ):
     """
     Chest X-Ray Pathology Classification Endpoint
@@ -25,14 +165,19 @@ async def predict_xray(
     Args:
         file: Uploaded image file (JPG/PNG)
         threshold: Minimum confidence score (default: 0.3)
+        cascade: Force the screening cascade on/off (default: service setting)
+        tta: Test-time augmentation: off | auto (borderline critical scores only) | always
+        format: "full" or "compact" (`scores` vector aligned with /api/model/info labels)
         
     Returns:
-        JSON response with predictions array containing:
+        JSON (or msgpack via Accept) response with predictions array containing:
         - label: Pathology name
         - score: Confidence score (0-1)
         - confidence_pct: Percentage (0-100)
         - severity: Classification (high/medium/low)
         - urgency_tier: Clinical urgency (critical/moderate/routine)
+        and `stage` ("screening" if short-circuited by the cascade, else "full").
+        With TTA, `uncertainty` holds the per-class score variance across views.
     """
     # Validate file type
     if file.content_type not in ALLOWED_TYPES:
@@ -41,6 +186,13 @@ async def predict_xray(
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_TYPES)}"
         )
     
+    if tta not in TTA_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid tta mode. Allowed: {', '.join(TTA_MODES)}"
+        )
+    _validate_format(format)
+    
     # Read file bytes
     try:
         image_bytes = await file.read()
@@ -52,27 +204,28 @@ async def predict_xray(
                 detail=f"File too large. Maximum size: {MAX_FILE_SIZE / (1024*1024)}MB"
             )
         
-        # Get model service and run inference
-        model_service = get_model_service()
+        # Pin the active model version for this request and run inference
+        registry = get_model_registry()
         
         # Measure inference time
         import time
         start_time = time.time()
-        predictions, overall_urgency = model_service.predict(image_bytes, threshold=threshold)
+        with registry.acquire() as version, memory_profiler.stage("inference"):
+            result = version.service.analyze(image_bytes, threshold=threshold, cascade=cascade, tta=tta)
         inference_time_ms = (time.time() - start_time) * 1000
+        stage_metrics.record("inference", inference_time_ms)
+        version.record_latency("inference", inference_time_ms)
+        
+        # Mirror a sample of traffic to the shadow candidate (if any)
+        registry.maybe_shadow(image_bytes, threshold, result)
         
         # Build response with clinical urgency
-        return {
+        return render({
             "success": True,
-            "predictions": predictions,
-            "urgency_tier": overall_urgency,  # Case-level urgency for triage
+            **_result_body(result, format),
             "inference_time_ms": round(inference_time_ms, 2),
-            "model_info": {
-                "name": "DenseNet121",
-                "num_classes": 13,
-                "threshold": threshold
-            }
-        }
+            "model_info": registry.model_info(version, threshold)
+        }, request.headers.get("accept"))
         
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
@@ -82,11 +235,112 @@ async def predict_xray(
         )
 
 
-@router.post("/predict-with-gradcam", response_model=Dict)
+@router.post(
+    "/predict-raw",
+    response_model=None,
+    responses={200: {
+        "model": Union[PredictResponse, CompactPredictResponse, BatchPredictResponse, CompactBatchPredictResponse],
+        "content": MSGPACK_CONTENT
+    }}
+)
+async def predict_raw(
+    request: Request,
+    threshold: float = 0.3,
+    cascade: Optional[bool] = None,
+    tta: str = "off",
+    format: str = "full",
+    x_image_shape: str = Header(...),
+    x_image_dtype: str = Header("uint8"),
+    x_image_layout: Optional[str] = Header(None)
+):
+    """
+    Classification from raw, already decoded pixels (no PNG/JPEG codec)
+    
+    Body: `application/octet-stream` C-order pixels. Headers:
+        X-Image-Shape: e.g. "512,512" (single) or "4,512,512" (batch)
+        X-Image-Dtype: uint8 | uint16 (default: uint8)
+        X-Image-Layout: HW | HWC | NHW | NHWC (optional, inferred from shape)
+    
+    Pre-resized 224x224 frames skip resampling work as well. A batch runs as
+    one ONNX call per stage; TTA is only available for single images.
+    
+    Returns:
+        Same body as /predict for a single image, or `results` (one per image) for a batch;
+        `format=compact` returns score vectors as in /predict
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != RAW_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {RAW_CONTENT_TYPE}")
+    
+    if tta not in TTA_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid tta mode. Allowed: {', '.join(TTA_MODES)}"
+        )
+    _validate_format(format)
+    
+    # Reject on the declared length before buffering the upload
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_RAW_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Body too large. Maximum size: {MAX_RAW_SIZE / (1024*1024)}MB"
+        )
+    
+    body = await request.body()
+    if len(body) > MAX_RAW_SIZE:  # chunked uploads carry no Content-Length
+        raise HTTPException(
+            status_code=413,
+            detail=f"Body too large. Maximum size: {MAX_RAW_SIZE / (1024*1024)}MB"
+        )
+    
+    pixels, is_batch = _parse_raw_pixels(body, x_image_shape, x_image_dtype, x_image_layout)
+    if is_batch and tta != "off":
+        raise HTTPException(status_code=400, detail="TTA is only supported for single images")
+    
+    try:
+        registry = get_model_registry()
+        
+        import time
+        start_time = time.time()
+        with registry.acquire() as version, memory_profiler.stage("inference"):
+            if is_batch:
+                results = version.service.analyze_batch(list(pixels), threshold=threshold, cascade=cascade)
+            else:
+                results = [version.service.analyze_array(pixels[0], threshold=threshold, cascade=cascade, tta=tta)]
+        inference_time_ms = (time.time() - start_time) * 1000
+        stage_metrics.record("inference", inference_time_ms)
+        version.record_latency("inference:batch" if is_batch else "inference", inference_time_ms)
+        
+        items = [_result_body(result, format) for result in results]
+        response = {"success": True}
+        if is_batch:
+            response["batch_size"] = len(items)
+            response["results"] = items
+        else:
+            response.update(items[0])
+        response["inference_time_ms"] = round(inference_time_ms, 2)
+        response["model_info"] = registry.model_info(version, threshold)
+        return render(response, request.headers.get("accept"))
+        
+    except Exception as e:
+        logger.error(f"Raw prediction error: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Inference failed: {str(e)}"
+        )
+
+
+@router.post(
+    "/predict-with-gradcam",
+    response_model=None,
+    responses={200: {"model": PredictWithGradCAMResponse, "content": MSGPACK_CONTENT}}
+)
 async def predict_with_gradcam(
+    request: Request,
     file: UploadFile = File(...),
     threshold: float = 0.3,
-    target_class: str = None
+    target_class: str = None,
+    format: str = "full"
 ):
     """
     Chest X-Ray Classification with Grad-CAM Heatmap (Combined endpoint)
@@ -95,18 +349,18 @@ async def predict_with_gradcam(
         file: Uploaded image file (JPG/PNG)
         threshold: Minimum confidence score (default: 0.3)
         target_class: Optional specific class for Grad-CAM (default: highest confidence)
+        format: "full" or "compact" (score vectors instead of per-label objects/maps)
         
     Returns:
-        JSON with predictions + Grad-CAM heatmap visualization
+        JSON (or msgpack via Accept) with predictions + Grad-CAM heatmap visualization
     """
-    from .gradcam_service import get_gradcam_service
-    
     # Validate file type
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_TYPES)}"
         )
+    _validate_format(format)
     
     try:
         image_bytes = await file.read()
@@ -122,30 +376,41 @@ async def predict_with_gradcam(
         import time
         start_time = time.time()
         
-        model_service = get_model_service()
-        predictions, overall_urgency = model_service.predict(image_bytes, threshold=threshold)
-        
-        # Generate Grad-CAM heatmap (slower but informative)
-        gradcam_service = get_gradcam_service()
-        gradcam_result = gradcam_service.generate_gradcam(
-            image_bytes,
-            target_class_name=target_class
-        )
+        registry = get_model_registry()
+        with registry.acquire() as version:
+            with memory_profiler.stage("inference"):
+                # Full model only: a screening short-circuit has no Grad-CAM counterpart
+                result = version.service.analyze(image_bytes, threshold=threshold, cascade=False)
+            version.record_latency("inference", (time.time() - start_time) * 1000)
+            
+            # Generate Grad-CAM heatmap (slower but informative)
+            gradcam_start = time.time()
+            with memory_profiler.stage("gradcam"):
+                gradcam_result = version.gradcam_service.generate_gradcam(
+                    image_bytes,
+                    target_class_name=target_class
+                )
+            gradcam_time_ms = (time.time() - gradcam_start) * 1000
+            stage_metrics.record("gradcam", gradcam_time_ms)
+            version.record_latency("gradcam", gradcam_time_ms)
         
         inference_time_ms = (time.time() - start_time) * 1000
         
-        return {
-            "success": True,
-            "predictions": predictions,
-            "urgency_tier": overall_urgency,
+        response = {"success": True}
+        if format == "compact":
+            response["scores"] = result["probabilities"]
+            # all_predictions follows LABELS, the /api/model/info label order
+            gradcam_result["all_scores"] = list(gradcam_result.pop("all_predictions").values())
+        else:
+            response["predictions"] = result["predictions"]
+        response.update({
+            "urgency_tier": result["urgency_tier"],
+            "stage": result["stage"],
             "inference_time_ms": round(inference_time_ms, 2),
             "gradcam": gradcam_result,
-            "model_info": {
-                "name": "DenseNet121",
-                "num_classes": 13,
-                "threshold": threshold
-            }
-        }
+            "model_info": registry.model_info(version, threshold)
+        })
+        return render(response, request.headers.get("accept"))
         
     except Exception as e:
         logger.error(f"Grad-CAM prediction error: {str(e)}")
@@ -155,8 +420,13 @@ async def predict_with_gradcam(
         )
 
 
-@router.post("/gradcam", response_model=Dict)
+@router.post(
+    "/gradcam",
+    response_model=None,
+    responses={200: {"model": GradCAMResponse, "content": MSGPACK_CONTENT}}
+)
 async def generate_gradcam_only(
+    request: Request,
     file: UploadFile = File(...),
     target_class: str = None
 ):
@@ -173,8 +443,6 @@ async def generate_gradcam_only(
     Returns:
         JSON with Grad-CAM heatmap only
     """
-    from .gradcam_service import get_gradcam_service
-    
     # Validate file type
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(
@@ -196,19 +464,23 @@ async def generate_gradcam_only(
         start_time = time.time()
         
         # Generate Grad-CAM heatmap only
-        gradcam_service = get_gradcam_service()
-        gradcam_result = gradcam_service.generate_gradcam(
-            image_bytes,
-            target_class_name=target_class
-        )
+        registry = get_model_registry()
+        with registry.acquire() as version, memory_profiler.stage("gradcam"):
+            gradcam_result = version.gradcam_service.generate_gradcam(
+                image_bytes,
+                target_class_name=target_class
+            )
         
         generation_time_ms = (time.time() - start_time) * 1000
+        stage_metrics.record("gradcam", generation_time_ms)
+        version.record_latency("gradcam", generation_time_ms)
         
-        return {
+        return render({
             "success": True,
             "gradcam": gradcam_result,
-            "generation_time_ms": round(generation_time_ms, 2)
-        }
+            "generation_time_ms": round(generation_time_ms, 2),
+            "model_info": registry.model_info(version)
+        }, request.headers.get("accept"))
         
     except Exception as e:
         logger.error(f"Grad-CAM generation error: {str(e)}")
@@ -223,9 +495,20 @@ async def health_check():
     """
     Health check endpoint for Docker health monitoring
     """
+    if memory_profiler.recycling:
+        # Over the memory budget: stop receiving traffic before the worker restarts
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "recycling",
+                "error": "Worker is restarting after exceeding its memory budget"
+            }
+        )
+    
     try:
-        model_service = get_model_service()
-        model_info = model_service.get_model_info()
+        registry = get_model_registry()
+        model_info = registry.active.service.get_model_info()
+        model_info["version"] = registry.active.name
         
         return {
             "status": "healthy",
@@ -255,3 +538,154 @@ async def get_model_info():
             status_code=500,
             detail=f"Failed to get model info: {str(e)}"
         )
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Per-stage latency metrics (inference, gradcam, serialize:<format>) and
+    worker memory (RSS, budget, per-stage peaks when profiling is enabled)
+    """
+    return {"stages": stage_metrics.summary(), "memory": memory_profiler.summary()}
+
+
+@router.get("/debug/memory", dependencies=[Depends(require_admin)])
+async def debug_memory(top: int = 10):
+    """
+    Worker memory report: RSS, budget state, per-stage peaks and, when
+    profiling is enabled, the `top` largest Python allocation sites
+    """
+    return memory_profiler.describe(top=top)
+
+
+@router.post("/debug/memory/profiling", dependencies=[Depends(require_admin)])
+async def toggle_memory_profiling(enabled: bool = True):
+    """
+    Turn per-stage memory profiling on/off at runtime (tracemalloc adds overhead)
+    """
+    if enabled:
+        memory_profiler.enable()
+    else:
+        memory_profiler.disable()
+    return {"success": True, "profiling": memory_profiler.enabled}
+
+
+@router.post("/debug/memory/trim", dependencies=[Depends(require_admin)])
+async def trim_memory():
+    """
+    Release memory now: gc, malloc_trim, ONNX Runtime arena shrinkage, CUDA cache
+    """
+    return {"success": True, **memory_profiler.trim()}
+
+
+@router.get("/model/cascade")
+async def get_cascade_metrics():
+    """
+    Screening cascade metrics (fraction of films short-circuited, stage timings)
+    """
+    try:
+        model_service = get_model_service()
+        return model_service.get_cascade_metrics()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get cascade metrics: {str(e)}"
+        )
+
+
+@router.get("/models")
+async def list_model_versions():
+    """
+    List registered model versions, the active version and shadow agreement stats
+    """
+    return get_model_registry().describe()
+
+
+@router.post("/models/{version}", dependencies=[Depends(require_admin)])
+async def register_model_version(
+    version: str,
+    model_path: str,
+    gradcam_model_path: Optional[str] = None,
+    screening_model_path: Optional[str] = None,
+    activate: bool = False
+):
+    """
+    Register a new model version and pre-warm it in the background
+    
+    Args:
+        version: Version name (e.g. "v2")
+        model_path: Path to the ONNX model (inside models/)
+        gradcam_model_path: Optional .pth checkpoint or Grad-CAM .onnx (backend follows the suffix, inside models/)
+        screening_model_path: Optional screening model (used by default only with LUNGVISION_CASCADE=1, inside models/)
+        activate: Swap to this version as soon as it is warm
+    """
+    registry = get_model_registry()
+    try:
+        registry.register(
+            version,
+            _model_file(model_path),
+            gradcam_model_path=_model_file(gradcam_model_path),
+            screening_model_path=_model_file(screening_model_path),
+            activate=activate
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "version": version, "status": "loading"}
+
+
+@router.post("/models/{version}/activate", dependencies=[Depends(require_admin)])
+async def activate_model_version(version: str):
+    """
+    Atomically swap new requests to `version`; in-flight requests finish on the old one
+    """
+    try:
+        get_model_registry().activate(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "active": version}
+
+
+@router.post("/models/{version}/shadow", dependencies=[Depends(require_admin)])
+async def shadow_model_version(version: str, fraction: float = 0.1):
+    """
+    Shadow-score `fraction` of /predict traffic on a candidate version
+    """
+    try:
+        get_model_registry().set_shadow(version, fraction)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "shadow": version, "fraction": fraction}
+
+
+@router.delete("/models/shadow", dependencies=[Depends(require_admin)])
+async def disable_shadow():
+    """
+    Stop shadow scoring
+    """
+    get_model_registry().set_shadow(None)
+    return {"success": True, "shadow": None}
+
+
+@router.delete("/models/{version}", dependencies=[Depends(require_admin)])
+async def unload_model_version(version: str, drain_timeout: float = 30.0):
+    """
+    Unload an inactive version after draining its in-flight requests
+    """
+    registry = get_model_registry()
+    try:
+        # Draining blocks, so keep it off the event loop
+        from starlette.concurrency import run_in_threadpool
+        unloaded = await run_in_threadpool(registry.unload, version, drain_timeout)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not unloaded:
+        raise HTTPException(status_code=409, detail=f"Model version '{version}' still has requests in flight")
+    return {"success": True, "unloaded": version}
@@ -2,39 +2,114 @@
 Grad-CAM Explainable AI Service for Lung Pathology Detection
 Generates gradient-based class activation maps to visualize model attention
 """
-import torch
-import torch.nn as nn
-import torchvision.models as models
-from pytorch_grad_cam import GradCAM
-from pytorch_grad_cam.utils.image import show_cam_on_image
-from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+from __future__ import annotations
+
+# PyTorch is only needed for the eager/optimized backends; the ONNX backend
+# serves CAMs with onnxruntime + NumPy so the serving image can drop torch
+try:
+    import torch
+    import torch.nn as nn
+    import torch.nn.functional as F
+    import torchvision.models as models
+except ImportError:
+    torch = None
+try:
+    from pytorch_grad_cam import GradCAM
+    from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+except ImportError:
+    GradCAM = None
+import onnxruntime as ort
 import numpy as np
 import cv2
 from PIL import Image
 import io
 import base64
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 import logging
+import os
+import threading
+
+from .memory_profiler import memory_profiler
+from .model_service import ModelService, LABELS  # Same label order as the model outputs
 
 logger = logging.getLogger(__name__)
 
-# Same labels as ONNX model
-LABELS = [
-    "Atelectasis", "Cardiomegaly", "Effusion", "Infiltration",
-    "Mass", "Nodule", "Pneumonia", "Pneumothorax",
-    "Consolidation", "Edema", "Emphysema", "Fibrosis", "Pleural_Thickening"
-]
+# CAM backends:
+#   eager     - pytorch_grad_cam hooks on the float32 eager model (reference)
+#   optimized - tuned CPU path: channels-last, frozen/compiled trunk up to
+#               denseblock4, optional BF16 autocast and closed-form head gradients
+#   onnx      - Grad-CAM graph from `convert_model.py --gradcam` on onnxruntime
+#               (logits, denseblock4 activations and gradients), no PyTorch needed
+GRADCAM_BACKENDS = ("eager", "optimized", "onnx")
+GRADCAM_BACKEND = os.getenv("LUNGVISION_GRADCAM_BACKEND", "eager")
+
+# Default model file per backend
+GRADCAM_MODEL_PATH = "models/best_model_finetuned.pth"
+GRADCAM_ONNX_MODEL_PATH = "models/gradcam_model.onnx"
+
+# ImageNet normalization stats
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406])
+IMAGENET_STD = np.array([0.229, 0.224, 0.225])
+
+# Trunk graph mode for the optimized backend: "freeze" (TorchScript trace + freeze),
+# "compile" (torch.compile) or "none" (eager modules, still channels-last)
+GRADCAM_COMPILE_MODE = os.getenv("LUNGVISION_GRADCAM_COMPILE", "freeze")
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+def backend_for_model(model_path: str, default: str = GRADCAM_BACKEND) -> str:
+    """
+    Grad-CAM backend able to load `model_path`
+    
+    A .onnx file is a Grad-CAM graph (onnx backend); anything else is a torch
+    checkpoint, served by `default` unless that is onnx, then by eager.
+    """
+    if str(model_path).endswith(".onnx"):
+        return "onnx"
+    return default if default != "onnx" else "eager"
 
 class GradCAMService:
-    """Service for generating Grad-CAM heatmaps using PyTorch model"""
+    """Service for generating Grad-CAM heatmaps using PyTorch or ONNX Runtime"""
     
-    def __init__(self, model_path: str = "models/best_model_finetuned.pth"):
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        backend: str = GRADCAM_BACKEND,
+        num_threads: Optional[int] = _env_int("LUNGVISION_TORCH_THREADS"),
+        num_interop_threads: Optional[int] = _env_int("LUNGVISION_TORCH_INTEROP_THREADS"),
+        channels_last: bool = True,
+        compile_mode: str = GRADCAM_COMPILE_MODE,
+        bf16: bool = os.getenv("LUNGVISION_GRADCAM_BF16", "0") == "1"
+    ):
         """
-        Initialize Grad-CAM service with PyTorch model
+        Initialize Grad-CAM service with PyTorch model (or ONNX Grad-CAM graph)
         
         Args:
-            model_path: Path to PyTorch .pth model file
+            model_path: Path to PyTorch .pth model file, or Grad-CAM .onnx for the
+                onnx backend (default: GRADCAM_MODEL_PATH / GRADCAM_ONNX_MODEL_PATH)
+            backend: "eager" (pytorch_grad_cam), "optimized" (tuned CPU path) or "onnx"
+            num_threads: torch intra-op threads (default: torch default)
+            num_interop_threads: torch inter-op threads (only settable once per process)
+            channels_last: Use channels-last memory format (optimized backend)
+            compile_mode: "freeze" | "compile" | "none" for the trunk (optimized backend)
+            bf16: Run the trunk under BF16 autocast when the CPU supports it (optimized backend)
         """
+        if backend not in GRADCAM_BACKENDS:
+            raise ValueError(f"Unknown Grad-CAM backend '{backend}'. Allowed: {', '.join(GRADCAM_BACKENDS)}")
+        
+        self.backend = backend
+        if backend == "onnx":
+            self._setup_onnx(model_path or GRADCAM_ONNX_MODEL_PATH)
+            return
+        
+        if torch is None:
+            raise ImportError(f"Grad-CAM backend '{backend}' requires torch and torchvision")
+        model_path = model_path or GRADCAM_MODEL_PATH
+        
+        self._configure_threads(num_threads, num_interop_threads)
+        
         # Force CPU to avoid CUDA kernel errors
         self.device = torch.device("cpu")
         # self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -65,33 +140,175 @@ class GradCAMService:
         # Target layer for Grad-CAM (last conv layer in DenseNet121)
         self.target_layers = [self.model.features.denseblock4]
         
-        # Initialize Grad-CAM
-        self.cam = GradCAM(model=self.model, target_layers=self.target_layers)
+        if backend == "optimized":
+            self._setup_optimized(channels_last, compile_mode, bf16)
+        else:
+            if GradCAM is None:
+                raise ImportError("Grad-CAM backend 'eager' requires pytorch_grad_cam (grad-cam)")
+            # Initialize Grad-CAM (hooks live on the shared model, so only in eager mode)
+            self.cam = GradCAM(model=self.model, target_layers=self.target_layers)
+        
+        logger.info(f"Grad-CAM service initialized successfully (backend: {backend})")
+    
+    def _setup_onnx(self, model_path: str):
+        """
+        Load the ONNX Grad-CAM graph exported by `convert_model.py --gradcam`
+        
+        Args:
+            model_path: Path to the Grad-CAM .onnx file
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Grad-CAM ONNX model not found: {model_path}")
+        
+        self.device = "cpu"
+        logger.info(f"Initializing Grad-CAM service on ONNX Runtime ({model_path})")
+        self.session = ort.InferenceSession(
+            model_path,
+            providers=['CPUExecutionProvider']
+        )
+        output_names = {output.name for output in self.session.get_outputs()}
+        missing = {"logits", "activations", "gradients"} - output_names
+        if missing:
+            raise ValueError(f"Not a Grad-CAM graph, missing outputs: {', '.join(sorted(missing))}")
+        logger.info("Grad-CAM service initialized successfully (backend: onnx)")
+    
+    @staticmethod
+    def _configure_threads(num_threads: Optional[int], num_interop_threads: Optional[int]):
+        """Apply torch intra-op / inter-op thread settings"""
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        if num_interop_threads:
+            try:
+                torch.set_num_interop_threads(num_interop_threads)
+            except RuntimeError as e:
+                # Can only be set before any inter-op parallel work has started
+                logger.warning(f"Could not set torch interop threads: {str(e)}")
+        logger.info(f"Torch threads: intra-op={torch.get_num_threads()}, inter-op={torch.get_num_interop_threads()}")
+    
+    def _setup_optimized(self, channels_last: bool, compile_mode: str, bf16: bool):
+        """
+        Build the tuned CPU CAM path
+        
+        The target layer is denseblock4, and everything after it (norm5 → ReLU →
+        global average pool → Linear) is cheap and, in eval mode, has a closed-form
+        gradient. So the trunk runs gradient-free (and can be frozen/compiled), and
+        d(score_c)/d(denseblock4) is written into a buffer reused across requests:
+        
+            grad = W[c] * gamma / sqrt(running_var + eps) / (H*W) * 1[norm5(A) > 0]
+        
+        which matches what pytorch_grad_cam's backward hooks capture.
+        """
+        self.channels_last = channels_last
+        self.bf16 = bf16 and torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+        if bf16 and not self.bf16:
+            logger.warning("BF16 autocast requested but not supported on this CPU; using float32")
+        
+        # Everything up to and including denseblock4 (norm5 is the last feature module)
+        trunk = nn.Sequential(*list(self.model.features.children())[:-1]).eval()
+        if channels_last:
+            trunk = trunk.to(memory_format=torch.channels_last)
+        
+        example = torch.zeros(1, 3, 224, 224)
+        if channels_last:
+            example = example.contiguous(memory_format=torch.channels_last)
+        
+        self.compile_mode = compile_mode
+        try:
+            if compile_mode == "freeze":
+                with torch.inference_mode(), self._autocast():
+                    trunk = torch.jit.freeze(torch.jit.trace(trunk, example))
+            elif compile_mode == "compile":
+                trunk = torch.compile(trunk)
+            elif compile_mode != "none":
+                raise ValueError(f"Unknown compile mode '{compile_mode}'")
+            
+            # Warm up (triggers TorchScript profiling / torch.compile codegen)
+            with torch.inference_mode(), self._autocast():
+                for _ in range(2):
+                    trunk(example)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.warning(f"Trunk {compile_mode} failed, falling back to eager modules: {str(e)}")
+            self.compile_mode = "none"
+            trunk = nn.Sequential(*list(self.model.features.children())[:-1]).eval()
+            if channels_last:
+                trunk = trunk.to(memory_format=torch.channels_last)
+        self._trunk = trunk
+        
+        # Constants of the closed-form head gradient
+        norm5 = self.model.features.norm5
+        with torch.no_grad():
+            self._bn_scale = (norm5.weight / torch.sqrt(norm5.running_var + norm5.eps)).detach().clone()
+        self._grad_buffer: Optional[torch.Tensor] = None
+        self._lock = threading.Lock()
+    
+    def _autocast(self):
+        """BF16 autocast context for the trunk (no-op when disabled)"""
+        return torch.autocast("cpu", dtype=torch.bfloat16, enabled=getattr(self, "bf16", False))
+    
+    def _forward_optimized(self, input_tensor: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """
+        Gradient-free forward through the tuned trunk and the classifier head
         
-        logger.info("Grad-CAM service initialized successfully")
+        Returns:
+            Tuple of (denseblock4 activations, norm5 output, probabilities)
+        """
+        with torch.inference_mode():
+            if self.channels_last:
+                input_tensor = input_tensor.contiguous(memory_format=torch.channels_last)
+            with self._autocast():
+                activations = self._trunk(input_tensor)
+            activations = activations.float()
+            normed = self.model.features.norm5(activations)
+            pooled = F.adaptive_avg_pool2d(F.relu(normed), (1, 1)).flatten(1)
+            logits = self.model.classifier(pooled)
+        return activations, normed, torch.sigmoid(logits)[0]
+    
+    def _cam_optimized(self, activations: torch.Tensor, normed: torch.Tensor, class_idx: int) -> np.ndarray:
+        """
+        Grad-CAM from closed-form gradients of the class score w.r.t. denseblock4
+        
+        Returns:
+            Grayscale CAM (224, 224) scaled to [0, 1]
+        """
+        with torch.inference_mode():
+            _, _, height, width = activations.shape
+            coef = self.model.classifier.weight[class_idx] * self._bn_scale / (height * width)
+            
+            if self._grad_buffer is None or self._grad_buffer.shape != normed.shape:
+                self._grad_buffer = torch.empty(normed.shape, dtype=torch.float32)
+            grads = torch.mul(normed > 0, coef[:, None, None], out=self._grad_buffer)
+            
+            return _cam_from_gradients(activations[0].numpy(), grads[0].numpy())
     
     def preprocess_image(self, image_bytes: bytes) -> tuple:
         """
         Preprocess image for PyTorch model and Grad-CAM
         
         Returns:
-            Tuple of (input_tensor, rgb_img_for_cam)
+            Tuple of (input_tensor, rgb_img_for_cam); input_tensor is a NumPy
+            array for the onnx backend
         """
-        # Load image
-        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        # Load image (shared decoder: 16-bit films are rescaled, not clipped)
+        image = ModelService._to_rgb(ModelService._decode_image(image_bytes))
         
-        # Resize to 224x224
-        image = image.resize((224, 224), Image.BILINEAR)
+        # Resize to 224x224 with the same cv2 bilinear kernel as the training
+        # pipeline (albumentations Resize); PIL's antialiased BILINEAR would
+        # score downscaled films differently from ModelService
+        image = cv2.resize(image, (224, 224), interpolation=cv2.INTER_LINEAR)
         
         # Convert to numpy for Grad-CAM visualization
-        rgb_img = np.array(image).astype(np.float32) / 255.0
+        rgb_img = image.astype(np.float32) / 255.0
         
         # Normalize for model (ImageNet stats)
-        mean = np.array([0.485, 0.456, 0.406])
-        std = np.array([0.229, 0.224, 0.225])
-        normalized = (rgb_img - mean) / std
+        normalized = (rgb_img - IMAGENET_MEAN) / IMAGENET_STD
+        
+        # Convert to [1, 3, 224, 224]
+        if self.backend == "onnx":
+            input_array = np.ascontiguousarray(normalized.transpose(2, 0, 1)[np.newaxis], dtype=np.float32)
+            return input_array, rgb_img
         
-        # Convert to tensor [1, 3, 224, 224]
         input_tensor = torch.from_numpy(normalized).permute(2, 0, 1).unsqueeze(0)
         input_tensor = input_tensor.to(self.device).float()
         
@@ -116,36 +333,26 @@ class GradCAMService:
         """
         try:
             # Preprocess image
-            input_tensor, rgb_img = self.preprocess_image(image_bytes)
+            with memory_profiler.stage("gradcam:preprocess"):
+                input_tensor, rgb_img = self.preprocess_image(image_bytes)
             
-            # Get predictions to determine target if not specified
-            with torch.no_grad():
-                outputs = self.model(input_tensor)
-                probabilities = torch.sigmoid(outputs)[0]
-            
-            # Determine target class
-            if target_class_name:
-                target_class_idx = LABELS.index(target_class_name)
-            elif target_class_idx is None:
-                # Use highest probability class
-                target_class_idx = probabilities.argmax().item()
+            with memory_profiler.stage("gradcam:cam"):
+                grayscale_cam, probabilities, target_class_idx = self.compute_cam(
+                    input_tensor, target_class_idx, target_class_name
+                )
             
             target_class = LABELS[target_class_idx]
             confidence = float(probabilities[target_class_idx])
             
-            # Generate Grad-CAM
-            targets = [ClassifierOutputTarget(target_class_idx)]
-            grayscale_cam = self.cam(input_tensor=input_tensor, targets=targets)
-            grayscale_cam = grayscale_cam[0, :]  # Get first image from batch
-            
-            # Create visualization
-            cam_image = show_cam_on_image(rgb_img, grayscale_cam, use_rgb=True)
-            
-            # Convert to base64
-            pil_image = Image.fromarray(cam_image)
-            buffered = io.BytesIO()
-            pil_image.save(buffered, format="PNG")
-            img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+            with memory_profiler.stage("gradcam:encode"):
+                # Create visualization
+                cam_image = _overlay_cam(rgb_img, grayscale_cam)
+                
+                # Convert to base64
+                pil_image = Image.fromarray(cam_image)
+                buffered = io.BytesIO()
+                pil_image.save(buffered, format="PNG")
+                img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
             
             return {
                 "heatmap_base64": f"data:image/png;base64,{img_base64}",
@@ -161,13 +368,128 @@ class GradCAMService:
         except Exception as e:
             logger.error(f"Grad-CAM generation failed: {str(e)}")
             raise
+    
+    def warmup(self, runs: int = 1):
+        """
+        Run dummy CAMs so the first request does not pay lazy initialisation
+        (ORT session setup, TorchScript profiling, torch.compile codegen)
+        
+        Args:
+            runs: Number of dummy compute_cam calls
+        """
+        if self.backend == "onnx":
+            dummy = np.zeros((1, 3, 224, 224), dtype=np.float32)
+        else:
+            dummy = torch.zeros(1, 3, 224, 224, device=self.device)
+        for _ in range(runs):
+            self.compute_cam(dummy, target_class_idx=0)
+    
+    def compute_cam(
+        self,
+        input_tensor: torch.Tensor,
+        target_class_idx: Optional[int] = None,
+        target_class_name: Optional[str] = None
+    ) -> Tuple[np.ndarray, torch.Tensor, int]:
+        """
+        Compute the grayscale Grad-CAM with the configured backend
+        
+        Args:
+            input_tensor: Preprocessed tensor (1, 3, 224, 224)
+            target_class_idx: Index of target class (0-12)
+            target_class_name: Name of target class (alternative to idx)
+            
+        Returns:
+            Tuple of (grayscale_cam (224, 224) in [0, 1], probabilities, target_class_idx)
+        """
+        if self.backend == "onnx":
+            if target_class_name:
+                target_class_idx = LABELS.index(target_class_name)
+            class_index = -1 if target_class_idx is None else target_class_idx  # -1: top class
+            logits, activations, gradients = self.session.run(
+                ["logits", "activations", "gradients"],
+                {"input": input_tensor, "class_index": np.array([class_index], dtype=np.int64)},
+                memory_profiler.run_options()
+            )
+            probabilities = 1 / (1 + np.exp(-logits[0]))
+            target_class_idx = self._resolve_target(probabilities, target_class_idx, None)
+            return _cam_from_gradients(activations[0], gradients[0]), probabilities, target_class_idx
+        
+        if self.backend == "optimized":
+            # One gradient-free forward serves both the predictions and the CAM
+            with self._lock:
+                activations, normed, probabilities = self._forward_optimized(input_tensor)
+                target_class_idx = self._resolve_target(probabilities, target_class_idx, target_class_name)
+                grayscale_cam = self._cam_optimized(activations, normed, target_class_idx)
+            return grayscale_cam, probabilities, target_class_idx
+        
+        # Get predictions to determine target if not specified
+        with torch.no_grad():
+            outputs = self.model(input_tensor)
+            probabilities = torch.sigmoid(outputs)[0]
+        
+        target_class_idx = self._resolve_target(probabilities, target_class_idx, target_class_name)
+        
+        # Generate Grad-CAM
+        targets = [ClassifierOutputTarget(target_class_idx)]
+        try:
+            grayscale_cam = self.cam(input_tensor=input_tensor, targets=targets)
+        finally:
+            # The hooks keep the last activations/gradients alive until the next
+            # request; drop them so idle workers don't pin them
+            self.cam.activations_and_grads.gradients = []
+            self.cam.activations_and_grads.activations = []
+        grayscale_cam = grayscale_cam[0, :]  # Get first image from batch
+        return grayscale_cam, probabilities, target_class_idx
+    
+    @staticmethod
+    def _resolve_target(
+        probabilities,
+        target_class_idx: Optional[int],
+        target_class_name: Optional[str]
+    ) -> int:
+        """Determine target class index (explicit name/idx, else highest probability)"""
+        if target_class_name:
+            return LABELS.index(target_class_name)
+        if target_class_idx is None:
+            # Use highest probability class
+            return probabilities.argmax().item()
+        return target_class_idx
+
+
+def _cam_from_gradients(activations: np.ndarray, gradients: np.ndarray) -> np.ndarray:
+    """
+    Grad-CAM from one image's target-layer activations and gradients (C, H, W)
+    
+    Same math as pytorch_grad_cam.GradCAM for a single target layer: channel
+    weights are the spatial mean of the gradients, the weighted activation sum
+    is ReLU'd, scaled to [0, 1], resized to 224x224 and scaled again.
+    """
+    weights = gradients.mean(axis=(1, 2))
+    cam = (weights[:, None, None] * activations).sum(axis=0)
+    cam = _scale_cam(np.maximum(cam, 0), (224, 224))
+    return _scale_cam(np.maximum(cam, 0))
+
+
+def _overlay_cam(rgb_img: np.ndarray, mask: np.ndarray, image_weight: float = 0.5) -> np.ndarray:
+    """Overlay a JET heatmap on an RGB image in [0, 1] (pytorch_grad_cam.show_cam_on_image)"""
+    heatmap = cv2.applyColorMap(np.uint8(255 * mask), cv2.COLORMAP_JET)
+    heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
+    heatmap = np.float32(heatmap) / 255
+    
+    cam = (1 - image_weight) * heatmap + image_weight * rgb_img
+    cam = cam / np.max(cam)
+    return np.uint8(255 * cam)
+
 
-# Singleton instance
-_gradcam_service = None
+def _scale_cam(cam: np.ndarray, target_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """Min-max scale a CAM to [0, 1] and optionally resize (pytorch_grad_cam semantics)"""
+    cam = cam - np.min(cam)
+    cam = cam / (1e-7 + np.max(cam))
+    if target_size is not None:
+        cam = cv2.resize(np.float32(cam), target_size)
+    return np.float32(cam)
 
 def get_gradcam_service() -> GradCAMService:
-    """Get or create singleton Grad-CAM service instance"""
-    global _gradcam_service
-    if _gradcam_service is None:
-        _gradcam_service = GradCAMService()
-    return _gradcam_service
+    """Get the Grad-CAM service of the active version in the model registry"""
+    from .model_registry import get_model_registry
+    return get_model_registry().active.gradcam_service
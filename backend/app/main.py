@@ -2,9 +2,10 @@
 Krida LungVision - FastAPI Main Application
 Production-ready AI service for Chest X-Ray classification
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from .api import router
+from .memory_profiler import memory_profiler
 import logging
 
 # Configure logging
@@ -34,6 +35,13 @@ app.add_middleware(
 # Register API routes
 app.include_router(router, prefix="/api", tags=["AI Inference"])
 
+@app.middleware("http")
+async def enforce_memory_budget(request: Request, call_next):
+    """Check the per-worker memory budget after each request (trim, then recycle)"""
+    response = await call_next(request)
+    memory_profiler.check_budget()
+    return response
+
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
@@ -57,8 +65,10 @@ async def root():
         "status": "running",
         "endpoints": {
             "predict": "/api/predict",
+            "predict_raw": "/api/predict-raw",
             "health": "/api/health",
             "model_info": "/api/model/info",
+            "models": "/api/models",
             "docs": "/docs"
         }
     }
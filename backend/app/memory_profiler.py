@@ -0,0 +1,370 @@
+"""
+Memory Profiler for Krida LungVision AI Service
+Opt-in per-stage peak allocation tracking (tracemalloc, RSS, torch allocator)
+and a per-worker memory budget that trims arenas or recycles the worker
+"""
+import ctypes
+import gc
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+import logging
+
+import onnxruntime as ort
+
+from .metrics import StageMetrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Per-stage profiling is off by default: tracemalloc slows every Python allocation
+MEMORY_PROFILING = os.getenv("LUNGVISION_MEMORY_PROFILING", "0") == "1"
+TRACEMALLOC_FRAMES = int(os.getenv("LUNGVISION_TRACEMALLOC_FRAMES", "1"))
+
+# Per-worker RSS budget in MB (0 disables it). Over budget the worker first trims
+# (gc, malloc_trim, ONNX Runtime arena shrinkage, torch CUDA cache); "recycle" then
+# restarts it gracefully if a later check is still over budget.
+MEMORY_BUDGET_MB = float(os.getenv("LUNGVISION_MEMORY_BUDGET_MB", "0"))
+MEMORY_BUDGET_ACTIONS = ("trim", "recycle")
+MEMORY_BUDGET_ACTION = os.getenv("LUNGVISION_MEMORY_BUDGET_ACTION", "recycle")
+
+# Minimum seconds between budget checks (reading RSS is cheap, trimming is not)
+MEMORY_CHECK_INTERVAL = float(os.getenv("LUNGVISION_MEMORY_CHECK_INTERVAL", "1.0"))
+
+# Seconds between failing /health and SIGTERM, so load balancers stop routing first
+RECYCLE_GRACE_SECONDS = float(os.getenv("LUNGVISION_RECYCLE_GRACE_SECONDS", "5.0"))
+
+MB = 1024 * 1024
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (Linux), else None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """High-water mark of the resident set size"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # KB on Linux
+
+
+def _cuda_torch():
+    """torch, if it is already imported and has CUDA (never imported just for stats)"""
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        return torch
+    return None
+
+
+def _malloc_trim() -> bool:
+    """Return freed glibc heap pages to the OS (no-op off glibc)"""
+    try:
+        return bool(ctypes.CDLL("libc.so.6").malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+def _round_mb(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value / MB, 2)
+
+
+class MemoryProfiler:
+    """Per-stage memory stats and the per-worker memory budget"""
+
+    def __init__(
+        self,
+        enabled: bool = MEMORY_PROFILING,
+        budget_mb: float = MEMORY_BUDGET_MB,
+        action: str = MEMORY_BUDGET_ACTION,
+        check_interval: float = MEMORY_CHECK_INTERVAL
+    ):
+        """
+        Args:
+            enabled: Start tracemalloc and record per-stage peaks
+            budget_mb: Per-worker RSS budget in MB (0: no budget)
+            action: "trim" or "recycle" when the budget is exceeded
+            check_interval: Minimum seconds between budget checks
+        """
+        if action not in MEMORY_BUDGET_ACTIONS:
+            raise ValueError(f"Unknown memory budget action '{action}'. Allowed: {', '.join(MEMORY_BUDGET_ACTIONS)}")
+
+        self.enabled = False
+        self.budget_mb = budget_mb
+        self.action = action
+        self.check_interval = check_interval
+        self.recycling = False
+        self._recycle_reason: Optional[str] = None
+
+        # Peak Python allocation, RSS growth (native: ONNX Runtime arenas, OpenCV,
+        # torch CPU) and peak torch CUDA allocation, each per stage
+        self._python_peak = StageMetrics(unit="mb")
+        self._rss_growth = StageMetrics(unit="mb")
+        self._cuda_peak = StageMetrics(unit="mb")
+        self._active: List[Dict[str, int]] = []
+        self._lock = threading.Lock()
+
+        # Used for ONNX Runtime runs while over budget: frees unused CPU arena chunks
+        self._shrink_options = ort.RunOptions()
+        self._shrink_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", "cpu:0")
+        self._shrink_arenas = False
+        self._trimmed = False
+        self._last_check = 0.0
+        self._trims = 0
+        self._last_trim: Optional[Dict] = None
+
+        if enabled:
+            self.enable()
+
+    def enable(self, frames: int = TRACEMALLOC_FRAMES):
+        """Start per-stage profiling (starts tracemalloc if needed)"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.enabled = True
+        logger.info(f"Memory profiling enabled (tracemalloc frames: {tracemalloc.get_traceback_limit()})")
+
+    def disable(self):
+        """Stop per-stage profiling and free the tracemalloc traces"""
+        self.enabled = False
+        with self._lock:
+            self._active.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        logger.info("Memory profiling disabled")
+
+    def stage(self, name: str):
+        """
+        Context manager recording the peak allocation of a stage (no-op when disabled)
+
+        tracemalloc is process-wide, so stages overlapping in other threads are
+        counted too; peaks of nested and concurrent stages are never lost.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._track(name)
+
+    def _fold_peaks(self):
+        """Fold the current peaks into every active stage and reset them (holding _lock)"""
+        _, python_peak = tracemalloc.get_traced_memory()
+        torch = _cuda_torch()
+        cuda_peak = torch.cuda.max_memory_allocated() if torch is not None else 0
+        for frame in self._active:
+            frame["python_peak"] = max(frame["python_peak"], python_peak)
+            frame["cuda_peak"] = max(frame["cuda_peak"], cuda_peak)
+        tracemalloc.reset_peak()
+        if torch is not None:
+            torch.cuda.reset_peak_memory_stats()
+
+    @contextmanager
+    def _track(self, name: str):
+        torch = _cuda_torch()
+        with self._lock:
+            self._fold_peaks()
+            python_current, _ = tracemalloc.get_traced_memory()
+            cuda_current = torch.cuda.memory_allocated() if torch is not None else 0
+            frame = {
+                "python_start": python_current, "python_peak": python_current,
+                "cuda_start": cuda_current, "cuda_peak": cuda_current,
+                "rss_start": _rss_bytes(),
+            }
+            self._active.append(frame)
+        try:
+            yield
+        finally:
+            with self._lock:
+                tracing = tracemalloc.is_tracing()  # False if disabled mid-stage
+                if tracing:
+                    self._fold_peaks()
+                self._active = [active for active in self._active if active is not frame]
+            if tracing:
+                self._record(name, frame, torch)
+
+    def _record(self, name: str, frame: Dict[str, int], torch):
+        """Record a finished stage into the per-stage stats"""
+        rss = _rss_bytes()
+        self._python_peak.record(name, (frame["python_peak"] - frame["python_start"]) / MB)
+        if rss is not None and frame["rss_start"] is not None:
+            self._rss_growth.record(name, (rss - frame["rss_start"]) / MB)
+        if torch is not None:
+            self._cuda_peak.record(name, (frame["cuda_peak"] - frame["cuda_start"]) / MB)
+
+    def run_options(self) -> Optional[ort.RunOptions]:
+        """RunOptions for ONNX Runtime sessions (arena shrinkage while over budget)"""
+        return self._shrink_options if self._shrink_arenas else None
+
+    def trim(self) -> Dict:
+        """
+        Release memory without restarting: gc, glibc malloc_trim, torch CUDA
+        cache, and arena shrinkage on the following ONNX Runtime runs
+
+        Returns:
+            Dict with RSS before/after (MB)
+        """
+        rss_before = _rss_bytes()
+        gc.collect()
+        torch = _cuda_torch()
+        if torch is not None:
+            torch.cuda.empty_cache()
+        malloc_trimmed = _malloc_trim()
+        self._shrink_arenas = True
+
+        self._trims += 1
+        self._last_trim = {
+            "at": time.time(),
+            "rss_before_mb": _round_mb(rss_before),
+            "rss_after_mb": _round_mb(_rss_bytes()),
+            "malloc_trim": malloc_trimmed,
+        }
+        logger.info(f"Memory trim: {self._last_trim['rss_before_mb']}MB -> {self._last_trim['rss_after_mb']}MB")
+        return self._last_trim
+
+    def check_budget(self):
+        """
+        Enforce the per-worker budget (called after each request)
+
+        The first check over budget trims; a later check still over budget
+        recycles the worker when the action is "recycle".
+        """
+        if self.budget_mb <= 0 or self.recycling:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        rss = _rss_bytes()
+        if rss is None or rss / MB <= self.budget_mb:
+            self._shrink_arenas = False
+            self._trimmed = False
+            return
+
+        if not self._trimmed:
+            logger.warning(f"Worker RSS {rss / MB:.0f}MB over budget ({self.budget_mb:.0f}MB), trimming")
+            self._trimmed = True
+            self.trim()
+        elif self.action == "recycle":
+            self.recycle(f"RSS {rss / MB:.0f}MB still over budget ({self.budget_mb:.0f}MB) after trimming")
+
+    def recycle(self, reason: str):
+        """
+        Gracefully restart this worker: /health turns 503 right away, then after
+        RECYCLE_GRACE_SECONDS a SIGTERM lets uvicorn finish in-flight requests and
+        exit (the process manager - gunicorn, Docker, Kubernetes - starts a new one)
+        """
+        if self.recycling:
+            return
+        self.recycling = True
+        self._recycle_reason = reason
+        logger.error(f"Recycling worker {os.getpid()}: {reason}")
+
+        def terminate():
+            time.sleep(RECYCLE_GRACE_SECONDS)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        threading.Thread(target=terminate, name="memory-recycle", daemon=True).start()
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Per-stage python_peak / rss_growth / cuda_peak stats (MB)"""
+        summary: Dict[str, Dict] = {}
+        for metric, stats in [
+            ("python_peak", self._python_peak),
+            ("rss_growth", self._rss_growth),
+            ("cuda_peak", self._cuda_peak),
+        ]:
+            for stage, values in stats.summary().items():
+                summary.setdefault(stage, {})[metric] = values
+        return summary
+
+    def summary(self) -> Dict:
+        """Compact memory section for /api/metrics"""
+        return {
+            "rss_mb": _round_mb(_rss_bytes()),
+            "peak_rss_mb": _round_mb(_peak_rss_bytes()),
+            "budget_mb": self.budget_mb or None,
+            "trims": self._trims,
+            "recycling": self.recycling,
+            "profiling": self.enabled,
+            "stages": self.stage_summary(),
+        }
+
+    def describe(self, top: int = 10) -> Dict:
+        """
+        Full memory report for the debug endpoint
+
+        Args:
+            top: Number of largest allocation sites (by line) to include
+
+        Returns:
+            Dict with process, budget, Python, torch and ONNX Runtime sections
+        """
+        report = {
+            "pid": os.getpid(),
+            "rss_mb": _round_mb(_rss_bytes()),
+            "peak_rss_mb": _round_mb(_peak_rss_bytes()),
+            "budget": {
+                "budget_mb": self.budget_mb or None,
+                "action": self.action,
+                "trims": self._trims,
+                "last_trim": self._last_trim,
+                "recycling": self.recycling,
+                "recycle_reason": self._recycle_reason,
+            },
+            "profiling": self.enabled,
+            "python": None,
+            "torch": None,
+            "onnxruntime": {
+                "version": ort.__version__,
+                "arena_shrinkage": self._shrink_arenas,
+            },
+            "stages": self.stage_summary(),
+            "top_allocations": [],
+        }
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["python"] = {
+                "traced_mb": _round_mb(current),
+                "peak_traced_mb": _round_mb(peak),
+                "tracemalloc_overhead_mb": _round_mb(tracemalloc.get_tracemalloc_memory()),
+            }
+            if top > 0:
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                ])
+                report["top_allocations"] = [
+                    {
+                        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                        "size_mb": _round_mb(stat.size),
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("lineno")[:top]
+                ]
+
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            report["torch"] = {"version": torch.__version__, "cuda": torch.cuda.is_available()}
+            if torch.cuda.is_available():
+                report["torch"].update({
+                    "cuda_allocated_mb": _round_mb(torch.cuda.memory_allocated()),
+                    "cuda_reserved_mb": _round_mb(torch.cuda.memory_reserved()),
+                })
+        return report
+
+
+# Process-wide instance
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,52 @@
+"""
+Stage Metrics for Krida LungVision AI Service
+Per-stage latency counters (inference, serialization, ...) exposed at /api/metrics;
+the same rolling stats back the per-stage memory figures of app.memory_profiler
+"""
+import threading
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+# Number of recent samples kept per stage for percentiles
+METRICS_WINDOW = 1000
+
+
+class StageMetrics:
+    """Thread-safe rolling stats keyed by stage name (latency in ms by default)"""
+
+    def __init__(self, window: int = METRICS_WINDOW, unit: str = "ms"):
+        self._window = window
+        self._unit = unit
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, value: float):
+        """Record one sample (in `unit`) for `stage`"""
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self._window)
+                self._counts[stage] = 0
+            self._samples[stage].append(value)
+            self._counts[stage] += 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return count and avg/p50/p95/max (in `unit`) per stage"""
+        with self._lock:
+            snapshot = {stage: (self._counts[stage], np.array(samples)) for stage, samples in self._samples.items()}
+        return {
+            stage: {
+                "count": count,
+                f"avg_{self._unit}": round(float(samples.mean()), 3),
+                f"p50_{self._unit}": round(float(np.percentile(samples, 50)), 3),
+                f"p95_{self._unit}": round(float(np.percentile(samples, 95)), 3),
+                f"max_{self._unit}": round(float(samples.max()), 3),
+            }
+            for stage, (count, samples) in snapshot.items()
+        }
+
+
+# Process-wide instance
+stage_metrics = StageMetrics()
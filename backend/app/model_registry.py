@@ -0,0 +1,464 @@
+"""
+Model Registry - Versioned Model Sessions with Zero-Downtime Swap
+Holds several named model versions, pre-warms new ones in the background,
+swaps the active version atomically and optionally shadow-scores a candidate
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+
+import numpy as np
+
+from .metrics import StageMetrics
+from .model_service import (
+    ModelService, LABELS, SCREENING_MODEL_PATH, URGENCY_PRIORITY, TTA_UNCERTAINTY_BAND, TTA_TIERS
+)
+
+logger = logging.getLogger(__name__)
+
+# Default version, overridable per deployment without code changes
+DEFAULT_VERSION = os.getenv("LUNGVISION_MODEL_VERSION", "v1")
+DEFAULT_MODEL_PATH = os.getenv("LUNGVISION_MODEL_PATH", "models/best_model.onnx")
+DEFAULT_GRADCAM_MODEL_PATH = os.getenv("LUNGVISION_GRADCAM_MODEL_PATH") or (
+    # The onnx Grad-CAM backend serves the exported graph instead of the .pth checkpoint
+    "models/gradcam_model.onnx" if os.getenv("LUNGVISION_GRADCAM_BACKEND") == "onnx"
+    else "models/best_model_finetuned.pth"
+)
+
+
+def _env_bounds(name: str) -> Optional[Dict[str, float]]:
+    """Parse "critical=0.01,Mass=0.005" into cascade bounds (tier or label keys)"""
+    value = os.getenv(name)
+    if not value:
+        return None
+    bounds = {}
+    for item in value.split(","):
+        key, _, bound = item.partition("=")
+        key = key.strip()
+        if key not in URGENCY_PRIORITY and key not in LABELS:
+            raise ValueError(f"{name}: unknown tier or label '{key}'")
+        bounds[key] = float(bound)
+        if not 0.0 <= bounds[key] <= 1.0:
+            raise ValueError(f"{name}: bound for '{key}' must be between 0 and 1")
+    return bounds
+
+# Screening cascade (off unless enabled): it trades some sensitivity for latency,
+# so it is only used when explicitly turned on, with bounds set per deployment
+CASCADE_ENABLED = os.getenv("LUNGVISION_CASCADE", "0") == "1"
+CASCADE_MODEL_PATH = os.getenv("LUNGVISION_SCREENING_MODEL_PATH", SCREENING_MODEL_PATH)
+CASCADE_BOUNDS = _env_bounds("LUNGVISION_CASCADE_BOUNDS")
+
+
+def _env_band(name: str, default: Tuple[float, float]) -> Tuple[float, float]:
+    """Parse "0.25,0.75" into a (low, high) score band"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        low, high = (float(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError(f"{name}: expected 'low,high', got '{value}'")
+    if not 0.0 <= low <= high <= 1.0:
+        raise ValueError(f"{name}: band must satisfy 0 <= low <= high <= 1")
+    return low, high
+
+def _env_tiers(name: str, default: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Parse "critical,moderate" into urgency tiers"""
+    value = os.getenv(name)
+    if not value:
+        return default
+    tiers = tuple(tier.strip() for tier in value.split(","))
+    for tier in tiers:
+        if tier not in URGENCY_PRIORITY:
+            raise ValueError(f"{name}: unknown tier '{tier}'")
+    return tiers
+
+# Test-time augmentation 'auto' mode: band and tiers that trigger the extra views
+TTA_BAND = _env_band("LUNGVISION_TTA_BAND", TTA_UNCERTAINTY_BAND)
+TTA_BAND_TIERS = _env_tiers("LUNGVISION_TTA_TIERS", TTA_TIERS)
+
+# Number of recent samples kept per version and stage for latency percentiles
+LATENCY_WINDOW = 1000
+
+# Dummy forwards run before a version can be activated (pays ORT cold start)
+WARMUP_RUNS = 2
+
+
+class ModelVersion:
+    """A named model version: ONNX service, Grad-CAM service and latency stats"""
+
+    def __init__(
+        self,
+        name: str,
+        model_path: str,
+        gradcam_model_path: Optional[str] = None,
+        screening_model_path: Optional[str] = None
+    ):
+        self.name = name
+        self.model_path = model_path
+        self.gradcam_model_path = gradcam_model_path
+        self.screening_model_path = screening_model_path
+        self.status = "loading"  # loading | ready | failed
+        self.error: Optional[str] = None
+        self.service: Optional[ModelService] = None
+        self.in_flight = 0
+        self.loaded_at: Optional[float] = None
+        self._gradcam_service = None
+        # Per stage ("inference", "inference:batch", "gradcam"): Grad-CAM takes seconds
+        # and inference tens of ms, so one shared window would mirror the endpoint mix
+        self._latency = StageMetrics(window=LATENCY_WINDOW)
+
+    def load(self, warmup_runs: int = WARMUP_RUNS):
+        """
+        Create the ONNX Runtime sessions (and the Grad-CAM service, if any) and
+        pre-warm them with dummy forwards; the version stays "loading" until done
+
+        Args:
+            warmup_runs: Number of dummy forwards per session
+        """
+        try:
+            service = ModelService(
+                model_path=self.model_path,
+                screening_model_path=self.screening_model_path,
+                cascade_bounds=CASCADE_BOUNDS,
+                cascade_enabled=CASCADE_ENABLED,
+                tta_band=TTA_BAND,
+                tta_tiers=TTA_BAND_TIERS
+            )
+            dummy = np.zeros((1, 3, 224, 224), dtype=np.float32)
+            for _ in range(warmup_runs):
+                service._full_logits(dummy)
+                if service.screening_session is not None:
+                    size = service.screening_input_size
+                    service.screening_session.run(
+                        [service.screening_output_name],
+                        {service.screening_input_name: np.zeros((1, 3, size, size), dtype=np.float32)}
+                    )
+            if self.gradcam_model_path is not None:
+                # torch.load / TorchScript freezing take seconds: pay them here,
+                # not on the first Grad-CAM request after the swap
+                from .gradcam_service import GradCAMService, backend_for_model
+                gradcam_service = GradCAMService(
+                    self.gradcam_model_path,
+                    backend=backend_for_model(self.gradcam_model_path)
+                )
+                gradcam_service.warmup()
+                self._gradcam_service = gradcam_service
+            self.service = service
+            self.loaded_at = time.time()
+            self.status = "ready"
+            logger.info(f"Model version '{self.name}' ready ({self.model_path})")
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logger.error(f"Failed to load model version '{self.name}': {str(e)}")
+
+    @property
+    def gradcam_service(self):
+        """Grad-CAM service for this version (built and warmed by `load`)"""
+        if self._gradcam_service is None:
+            raise RuntimeError(f"Model version '{self.name}' has no Grad-CAM checkpoint")
+        return self._gradcam_service
+
+    def record_latency(self, stage: str, latency_ms: float):
+        """Record the latency of one model call in `stage` on this version"""
+        self._latency.record(stage, latency_ms)
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return count and avg/p50/p95/max latency per stage over the recent window"""
+        return self._latency.summary()
+
+    def describe(self) -> Dict[str, any]:
+        """Return version metadata for the registry listing"""
+        return {
+            "version": self.name,
+            "status": self.status,
+            "error": self.error,
+            "model_path": self.model_path,
+            "gradcam_model_path": self.gradcam_model_path,
+            "screening_model_path": self.screening_model_path,
+            "in_flight": self.in_flight,
+            "loaded_at": self.loaded_at,
+            "latency": self.get_latency_stats(),
+        }
+
+
+class ModelRegistry:
+    """Registry of named model versions with atomic activation and shadow scoring"""
+
+    def __init__(self):
+        self._versions: Dict[str, ModelVersion] = {}
+        self._active: Optional[str] = None
+        self._cond = threading.Condition()
+
+        # Shadow scoring of a candidate version on a fraction of traffic
+        self._shadow: Optional[str] = None
+        self._shadow_fraction = 0.0
+        self._shadow_stats: Dict[str, Dict[str, float]] = {}
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        # At most one shadow job pending: mirrors are dropped (and counted) while
+        # the candidate is busy, so a slow candidate cannot queue up image bytes
+        self._shadow_slot = threading.Semaphore(1)
+        self._shadow_dropped = 0
+
+    def register(
+        self,
+        name: str,
+        model_path: str,
+        gradcam_model_path: Optional[str] = None,
+        screening_model_path: Optional[str] = None,
+        background: bool = True,
+        activate: bool = False
+    ) -> ModelVersion:
+        """
+        Register and pre-warm a new model version
+
+        Args:
+            name: Version name (e.g. "v2")
+            model_path: Path to ONNX model file
+            gradcam_model_path: Optional .pth checkpoint or Grad-CAM .onnx (backend follows the suffix)
+            screening_model_path: Optional screening model for the cascade
+            background: Load in a background thread (serving continues meanwhile)
+            activate: Activate the version as soon as it is warm
+
+        Returns:
+            The (possibly still loading) ModelVersion
+        """
+        if not Path(model_path).exists():
+            raise FileNotFoundError(f"Model not found: {model_path}")
+
+        with self._cond:
+            existing = self._versions.get(name)
+            if existing is not None and (existing.status == "loading" or name == self._active):
+                raise ValueError(f"Model version '{name}' is loading or active")
+            version = ModelVersion(name, model_path, gradcam_model_path, screening_model_path)
+            self._versions[name] = version
+
+        def load():
+            version.load()
+            if activate and version.status == "ready":
+                with self._cond:
+                    # The version may have been unloaded (or replaced) while loading
+                    if self._versions.get(name) is not version:
+                        logger.warning(f"Model version '{name}' was unloaded while loading; not activating")
+                        return
+                    self.activate(name)
+
+        if background:
+            threading.Thread(target=load, name=f"load-{name}", daemon=True).start()
+        else:
+            load()
+        return version
+
+    def activate(self, name: str):
+        """
+        Atomically make `name` the version served to new requests
+
+        Requests already running keep the version they acquired, so the
+        previous version drains naturally; call `unload` to release it.
+        """
+        with self._cond:
+            version = self._get(name)
+            if version.status != "ready":
+                raise ValueError(f"Model version '{name}' is not ready (status: {version.status})")
+            previous = self._active
+            self._active = name
+            if self._shadow == name:
+                self._shadow = None
+        logger.info(f"Activated model version '{name}' (previous: {previous})")
+
+    def unload(self, name: str, drain_timeout: float = 30.0) -> bool:
+        """
+        Remove an inactive version once its in-flight requests have drained
+
+        Args:
+            name: Version to remove
+            drain_timeout: Seconds to wait for in-flight requests
+
+        Returns:
+            True if removed, False if requests were still in flight at timeout
+        """
+        with self._cond:
+            version = self._get(name)
+            if name == self._active:
+                raise ValueError(f"Cannot unload active model version '{name}'")
+            if self._shadow == name:
+                self._shadow = None
+            drained = self._cond.wait_for(lambda: version.in_flight == 0, timeout=drain_timeout)
+            if not drained:
+                return False
+            del self._versions[name]
+        logger.info(f"Unloaded model version '{name}'")
+        return True
+
+    def set_shadow(self, name: Optional[str], fraction: float = 0.1):
+        """
+        Shadow-score a fraction of traffic on a candidate version
+
+        Shadow results are never returned to clients; only agreement stats are kept.
+
+        Args:
+            name: Candidate version (None disables shadowing)
+            fraction: Fraction of requests to mirror (0-1)
+        """
+        if not 0.0 <= fraction <= 1.0:
+            raise ValueError("Shadow fraction must be between 0 and 1")
+        with self._cond:
+            if name is not None:
+                if self._get(name).status != "ready":
+                    raise ValueError(f"Model version '{name}' is not ready")
+                if name == self._active:
+                    raise ValueError("Cannot shadow the active model version")
+            self._shadow = name
+            self._shadow_fraction = fraction if name is not None else 0.0
+
+    @contextmanager
+    def acquire(self, name: Optional[str] = None):
+        """
+        Pin a version for the duration of one request (unload waits for it)
+
+        Usage:
+            with registry.acquire() as version:
+                version.service.analyze(image_bytes)
+        """
+        with self._cond:
+            version = self._get(name or self._active)
+            if version.status != "ready":
+                raise RuntimeError(f"Model version '{version.name}' is not ready")
+            version.in_flight += 1
+
+        try:
+            yield version
+        finally:
+            with self._cond:
+                version.in_flight -= 1
+                self._cond.notify_all()
+
+    def maybe_shadow(self, image_bytes: bytes, threshold: float, primary: Dict[str, any]):
+        """
+        Mirror a request to the shadow candidate (sampled, off the request path)
+
+        Args:
+            image_bytes: Raw image bytes of the primary request
+            threshold: Threshold used for the primary prediction
+            primary: Result dict from ModelService.analyze on the active version
+        """
+        shadow = self._shadow
+        if shadow is None or random.random() >= self._shadow_fraction:
+            return
+        if not self._shadow_slot.acquire(blocking=False):
+            with self._cond:
+                self._shadow_dropped += 1
+            return
+        try:
+            self._shadow_executor.submit(self._run_shadow, shadow, image_bytes, threshold, primary)
+        except Exception:
+            self._shadow_slot.release()
+            raise
+
+    def _run_shadow(self, name: str, image_bytes: bytes, threshold: float, primary: Dict[str, any]):
+        """Score on the shadow version and accumulate agreement with the primary"""
+        try:
+            with self.acquire(name) as version:
+                start_time = time.perf_counter()
+                result = version.service.analyze(image_bytes, threshold=threshold, cascade=False)
+                version.record_latency("inference", (time.perf_counter() - start_time) * 1000)
+        except Exception as e:
+            logger.warning(f"Shadow scoring on '{name}' failed: {str(e)}")
+            return
+        finally:
+            self._shadow_slot.release()
+
+        abs_diff = float(np.abs(result["probabilities"] - primary["probabilities"]).mean())
+        same_labels = (
+            {p["label"] for p in result["predictions"]} == {p["label"] for p in primary["predictions"]}
+        )
+        with self._cond:
+            stats = self._shadow_stats.setdefault(
+                name, {"requests": 0, "sum_abs_diff": 0.0, "urgency_agree": 0, "labels_agree": 0}
+            )
+            stats["requests"] += 1
+            stats["sum_abs_diff"] += abs_diff
+            stats["urgency_agree"] += int(result["urgency_tier"] == primary["urgency_tier"])
+            stats["labels_agree"] += int(same_labels)
+
+    def model_info(self, version: ModelVersion, threshold: Optional[float] = None) -> Dict[str, any]:
+        """Build the `model_info` block included in every inference response"""
+        info = {
+            "name": "DenseNet121",
+            "num_classes": len(LABELS),
+            "version": version.name,
+            "latency": version.get_latency_stats(),
+        }
+        if threshold is not None:
+            info["threshold"] = threshold
+        return info
+
+    def describe(self) -> Dict[str, any]:
+        """Return registry state: versions, active version and shadow agreement"""
+        with self._cond:
+            shadow_stats = {}
+            for name, stats in self._shadow_stats.items():
+                n = stats["requests"]
+                shadow_stats[name] = {
+                    "requests": n,
+                    "mean_abs_diff": round(stats["sum_abs_diff"] / n, 6) if n else 0.0,
+                    "urgency_agreement": round(stats["urgency_agree"] / n, 4) if n else 0.0,
+                    "label_agreement": round(stats["labels_agree"] / n, 4) if n else 0.0,
+                }
+            return {
+                "active": self._active,
+                "shadow": {
+                    "version": self._shadow,
+                    "fraction": self._shadow_fraction,
+                    "dropped": self._shadow_dropped,  # sampled but skipped (candidate busy)
+                },
+                "versions": [v.describe() for v in self._versions.values()],
+                "shadow_stats": shadow_stats,
+            }
+
+    @property
+    def active(self) -> ModelVersion:
+        """Currently active version"""
+        with self._cond:
+            return self._get(self._active)
+
+    def _get(self, name: Optional[str]) -> ModelVersion:
+        if name is None or name not in self._versions:
+            raise KeyError(f"Unknown model version: {name}")
+        return self._versions[name]
+
+
+# Singleton instance
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Get or create ModelRegistry singleton with the default version loaded and active"""
+    global _model_registry
+    if _model_registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                registry = ModelRegistry()
+                # Grad-CAM is optional: serve predictions even without its model file
+                gradcam_path = DEFAULT_GRADCAM_MODEL_PATH if Path(DEFAULT_GRADCAM_MODEL_PATH).exists() else None
+                if gradcam_path is None:
+                    logger.warning(f"Grad-CAM model not found ({DEFAULT_GRADCAM_MODEL_PATH}); Grad-CAM disabled")
+                version = registry.register(
+                    DEFAULT_VERSION,
+                    DEFAULT_MODEL_PATH,
+                    gradcam_model_path=gradcam_path,
+                    screening_model_path=CASCADE_MODEL_PATH if CASCADE_ENABLED else None,
+                    background=False
+                )
+                if version.status != "ready":
+                    raise RuntimeError(f"Failed to load default model: {version.error}")
+                registry.activate(DEFAULT_VERSION)
+                _model_registry = registry
+    return _model_registry
@@ -5,11 +5,15 @@ Replicates Training3.ipynb preprocessing pipeline for production inference
 import numpy as np
 from PIL import Image
 import albumentations as A
-from albumentations.pytorch import ToTensorV2
 import onnxruntime as ort
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Optional, Sequence, Tuple
 import io
+import cv2
+import threading
+import time
+
+from .memory_profiler import memory_profiler
 
 # Exact labels from Training3.ipynb (13 classes)
 LABELS = [
@@ -52,13 +56,54 @@ URGENCY_PRIORITY = {
     'routine': 2,
 }
 
+# Screening cascade: a cheap first-stage model (low-resolution export or distilled
+# network from convert_model.py) short-circuits films it is confident are negative.
+SCREENING_MODEL_PATH = "models/screening_model.onnx"
+SCREENING_INPUT_SIZE = 128
+
+# A film is short-circuited only if EVERY class scores below its bound in the
+# screening pass (and below the request threshold). Critical findings get the
+# tightest bound so missed positives are least likely where they matter most.
+# Keys may be urgency tiers or individual labels (label keys take precedence).
+CASCADE_NEGATIVE_BOUNDS = {
+    'critical': 0.02,
+    'moderate': 0.05,
+    'routine': 0.10,
+}
+
+# Test-time augmentation: extra views are built from the single decoded image and
+# scored in ONE batched ONNX call. Scale views resize slightly larger, then
+# center-crop back to 224, mimicking small zoom/crop jitter.
+TTA_FLIP = True
+TTA_SCALES = (240, 256)
+TTA_MODES = ('off', 'auto', 'always')
+
+# In 'auto' mode TTA only runs when a first-pass score of a class in TTA_TIERS
+# lands inside this band, so the average cost stays close to one forward.
+TTA_UNCERTAINTY_BAND = (0.3, 0.7)
+TTA_TIERS = ('critical',)
+
 class ModelService:
-    def __init__(self, model_path: str = "models/best_model.onnx"):
+    def __init__(
+        self,
+        model_path: str = "models/best_model.onnx",
+        screening_model_path: Optional[str] = None,
+        cascade_bounds: Optional[Dict[str, float]] = None,
+        cascade_enabled: bool = False,
+        tta_band: Tuple[float, float] = TTA_UNCERTAINTY_BAND,
+        tta_tiers: Tuple[str, ...] = TTA_TIERS
+    ):
         """
         Initialize ONNX Runtime session with the converted model
         
         Args:
             model_path: Path to ONNX model file
+            screening_model_path: Optional first-stage ONNX model for the screening cascade
+            cascade_bounds: Per-tier (or per-label) negative bounds for short-circuiting
+            cascade_enabled: Use the cascade by default when a screening model is loaded
+                (off unless requested: the cascade trades sensitivity for latency)
+            tta_band: (low, high) first-pass score band that triggers TTA in 'auto' mode
+            tta_tiers: Urgency tiers whose scores are checked against `tta_band`
         """
         self.model_path = Path(model_path)
         if not self.model_path.exists():
@@ -82,13 +127,77 @@ class ModelService:
             A.Normalize(
                 mean=IMAGENET_MEAN,
                 std=IMAGENET_STD
-            ),
-            ToTensorV2()
+            )
         ])
         
+        # Test-time augmentation scale views (resize up, center-crop back to 224)
+        self.tta_band = tta_band
+        self.tta_tiers = tuple(tta_tiers)
+        self.tta_scale_transforms = [
+            A.Compose([
+                A.Resize(size, size),
+                A.CenterCrop(224, 224),
+                A.Normalize(
+                    mean=IMAGENET_MEAN,
+                    std=IMAGENET_STD
+                )
+            ])
+            for size in TTA_SCALES
+        ]
+        
         print(f"[ModelService] Model loaded successfully")
         print(f"[ModelService] Input: {self.input_name} | Output: {self.output_name}")
         print(f"[ModelService] Ready for inference on {len(LABELS)} classes")
+        
+        # Optional screening stage for the two-stage cascade
+        self.screening_session = None
+        self.cascade_enabled = False
+        self.cascade_bounds = dict(CASCADE_NEGATIVE_BOUNDS)
+        if cascade_bounds:
+            self.cascade_bounds.update(cascade_bounds)
+        self._cascade_lock = threading.Lock()
+        self._cascade_stats = {
+            "total": 0,
+            "short_circuited": 0,
+            "screening_time_ms": 0.0,
+            "full_time_ms": 0.0,
+        }
+        if screening_model_path is not None:
+            self._load_screening_model(screening_model_path)
+            self.cascade_enabled = cascade_enabled
+    
+    def _load_screening_model(self, screening_model_path: str):
+        """
+        Load the first-stage screening model used by the cascade
+        
+        Args:
+            screening_model_path: Path to screening ONNX model file
+        """
+        path = Path(screening_model_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Screening model not found: {screening_model_path}")
+        
+        print(f"[ModelService] Loading screening model from {screening_model_path}")
+        self.screening_session = ort.InferenceSession(
+            str(path),
+            providers=['CPUExecutionProvider']
+        )
+        screening_input = self.screening_session.get_inputs()[0]
+        self.screening_input_name = screening_input.name
+        self.screening_output_name = self.screening_session.get_outputs()[0].name
+        
+        # Use the exported spatial size if static, otherwise the default low resolution
+        height = screening_input.shape[2] if len(screening_input.shape) == 4 else None
+        self.screening_input_size = height if isinstance(height, int) else SCREENING_INPUT_SIZE
+        
+        self.screening_transform = A.Compose([
+            A.Resize(self.screening_input_size, self.screening_input_size),
+            A.Normalize(
+                mean=IMAGENET_MEAN,
+                std=IMAGENET_STD
+            )
+        ])
+        print(f"[ModelService] Screening cascade ready at {self.screening_input_size}x{self.screening_input_size}")
     
     def preprocess_image(self, image_bytes: bytes) -> np.ndarray:
         """
@@ -100,70 +209,372 @@ class ModelService:
         Returns:
             Preprocessed numpy array (1, 3, 224, 224)
         """
+        return self._transform_array(self._to_rgb(self._decode_image(image_bytes)), self.transform)
+    
+    @staticmethod
+    def _decode_image(image_bytes: bytes) -> np.ndarray:
+        """
+        Decode image bytes to an RGB uint8 array (H, W, 3), or a uint16 (H, W)
+        array for 16-bit grayscale films (rescaled later by `_to_rgb`)
+        """
         # Load image
         image = Image.open(io.BytesIO(image_bytes))
         
+        # 16-bit grayscale: PIL's convert('RGB') would clip every value above 255
+        if image.mode.startswith('I;16'):
+            return np.array(image).astype(np.uint16)
+        if image.mode == 'I':
+            return np.clip(np.array(image), 0, 65535).astype(np.uint16)
+        
         # Convert to RGB (handle grayscale X-rays)
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
         # Convert to numpy array
-        image_np = np.array(image)
+        return np.array(image)
+    
+    @staticmethod
+    def _to_rgb(image_np: np.ndarray) -> np.ndarray:
+        """
+        Bring a raw pixel array to the (H, W, 3) layout the transforms expect
         
+        uint8 RGB passes through untouched (no copy). Grayscale is replicated to
+        3 channels like PIL's convert('RGB'); uint16 is rescaled to the 0-255
+        range as float32 so Normalize's max_pixel_value=255 still applies.
+        """
+        if image_np.ndim == 3 and image_np.shape[2] == 1:
+            image_np = image_np[:, :, 0]
+        if image_np.ndim not in (2, 3) or (image_np.ndim == 3 and image_np.shape[2] != 3):
+            raise ValueError(f"Expected (H, W), (H, W, 1) or (H, W, 3) pixels, got shape {image_np.shape}")
+        
+        if image_np.dtype == np.uint16:
+            image_np = image_np.astype(np.float32) * (255.0 / 65535.0)
+        elif image_np.dtype != np.uint8:
+            raise ValueError(f"Unsupported pixel dtype {image_np.dtype}; expected uint8 or uint16")
+        
+        if image_np.ndim == 2:
+            image_np = cv2.cvtColor(image_np, cv2.COLOR_GRAY2RGB)
+        return image_np
+    
+    @staticmethod
+    def _transform_array(image_np: np.ndarray, transform: A.Compose) -> np.ndarray:
+        """Apply an albumentations pipeline and add the batch dimension"""
         # Apply albumentations transforms (Resize + Normalize)
-        transformed = self.transform(image=image_np)
-        image_tensor = transformed['image']
+        transformed = transform(image=image_np)
         
-        # Convert PyTorch tensor to numpy and add batch dimension
-        # Shape: (3, 224, 224) → (1, 3, 224, 224)
-        image_np_batch = np.expand_dims(image_tensor.numpy(), axis=0)
+        # HWC → CHW (what ToTensorV2 did, without importing torch) and add batch dimension
+        # Shape: (H, W, 3) → (1, 3, H, W)
+        image_np_batch = np.expand_dims(transformed['image'].transpose(2, 0, 1), axis=0)
         
-        return image_np_batch.astype(np.float32)
+        return np.ascontiguousarray(image_np_batch, dtype=np.float32)
+    
+    def _full_logits(self, input_array: np.ndarray) -> np.ndarray:
+        """Run the full DenseNet121 model on a (N, 3, 224, 224) batch and return logits (N, 13)"""
+        # Run ONNX inference
+        outputs = self.session.run(
+            [self.output_name],
+            {self.input_name: input_array},
+            memory_profiler.run_options()
+        )
+        return outputs[0]
+    
+    def _run_full(self, image_np: np.ndarray) -> np.ndarray:
+        """Run the full DenseNet121 model and return per-class probabilities"""
+        input_array = self._transform_array(image_np, self.transform)
+        
+        # Get raw logits and apply sigmoid for multi-label classification
+        logits = self._full_logits(input_array)[0]  # Shape: (13,)
+        return self._sigmoid(logits)
     
-    def predict(self, image_bytes: bytes, threshold: float = 0.5) -> Tuple[List[Dict[str, any]], str]:
+    def _build_tta_batch(self, image_np: np.ndarray, include_identity: bool = True) -> np.ndarray:
         """
-        Run ONNX inference and return predictions with clinical urgency classification
+        Build all augmented views of one decoded image as a single batch
+        
+        Args:
+            image_np: Decoded RGB image (H, W, 3)
+            include_identity: Include the un-augmented view (skip if already scored)
+            
+        Returns:
+            Float32 batch (N, 3, 224, 224)
+        """
+        base = self._transform_array(image_np, self.transform)[0]
+        views = [base] if include_identity else []
+        if TTA_FLIP:
+            views.append(base[:, :, ::-1])
+        for transform in self.tta_scale_transforms:
+            views.append(self._transform_array(image_np, transform)[0])
+        return np.ascontiguousarray(np.stack(views), dtype=np.float32)
+    
+    def _needs_tta(self, probabilities: np.ndarray) -> bool:
+        """Check if any TTA-tier class scores inside the uncertainty band"""
+        low, high = self.tta_band
+        for label, score in zip(LABELS, probabilities):
+            if URGENCY_TIERS.get(label, 'routine') in self.tta_tiers and low <= score <= high:
+                return True
+        return False
+    
+    def _run_screening(self, image_np: np.ndarray) -> np.ndarray:
+        """Run the cheap screening model and return per-class probabilities"""
+        input_array = self._transform_array(image_np, self.screening_transform)
+        outputs = self.screening_session.run(
+            [self.screening_output_name],
+            {self.screening_input_name: input_array},
+            memory_profiler.run_options()
+        )
+        return self._sigmoid(outputs[0][0])
+    
+    def _is_confident_negative(self, probabilities: np.ndarray, threshold: float) -> bool:
+        """
+        Check whether screening scores are below every class bound
+        
+        A class bound is its label (or urgency tier) cascade bound, capped by the
+        request threshold so a short-circuit can never hide a reportable finding.
+        """
+        for label, score in zip(LABELS, probabilities):
+            tier = URGENCY_TIERS.get(label, 'routine')
+            bound = self.cascade_bounds.get(label, self.cascade_bounds.get(tier, 0.0))
+            if score >= min(bound, threshold):
+                return False
+        return True
+    
+    def analyze(
+        self,
+        image_bytes: bytes,
+        threshold: float = 0.5,
+        cascade: Optional[bool] = None,
+        tta: str = 'off'
+    ) -> Dict[str, any]:
+        """
+        Run inference (optionally through the screening cascade) with full details
         
         Args:
             image_bytes: Raw image bytes
             threshold: Minimum confidence score to include in results
+            cascade: Force cascade on/off (default: service setting)
+            tta: 'off' | 'auto' (only inside the uncertainty band) | 'always'
             
         Returns:
-            Tuple of (predictions list, overall_urgency_tier)
+            Dict with predictions, urgency_tier, probabilities, the deciding stage
+            and TTA uncertainty (per-class variance across views)
         """
-        # Preprocess image
-        input_array = self.preprocess_image(image_bytes)
+        with memory_profiler.stage("decode"):
+            image_np = self._decode_image(image_bytes)
+        return self.analyze_array(image_np, threshold=threshold, cascade=cascade, tta=tta)
+    
+    def analyze_array(
+        self,
+        image_np: np.ndarray,
+        threshold: float = 0.5,
+        cascade: Optional[bool] = None,
+        tta: str = 'off'
+    ) -> Dict[str, any]:
+        """
+        Same as `analyze` for an already decoded image (skips the codec entirely)
         
-        # Run ONNX inference
-        outputs = self.session.run(
-            [self.output_name],
-            {self.input_name: input_array}
-        )
+        Args:
+            image_np: Pixel array (H, W), (H, W, 1) or (H, W, 3), uint8 or uint16
+            threshold: Minimum confidence score to include in results
+            cascade: Force cascade on/off (default: service setting)
+            tta: 'off' | 'auto' | 'always'
+            
+        Returns:
+            Same dict as `analyze`
+        """
+        if tta not in TTA_MODES:
+            raise ValueError(f"Invalid tta mode '{tta}'. Allowed: {', '.join(TTA_MODES)}")
         
-        # Get raw logits and apply sigmoid for multi-label classification
-        logits = outputs[0][0]  # Shape: (13,)
-        probabilities = self._sigmoid(logits)
+        image_np = self._to_rgb(image_np)
+        
+        use_cascade = self.cascade_enabled if cascade is None else cascade
+        use_cascade = use_cascade and self.screening_session is not None
+        
+        stage = "full"
+        logits = None
+        if use_cascade:
+            start_time = time.perf_counter()
+            probabilities = self._run_screening(image_np)
+            screening_ms = (time.perf_counter() - start_time) * 1000
+            short_circuited = self._is_confident_negative(probabilities, threshold)
+            
+            full_ms = 0.0
+            if short_circuited:
+                stage = "screening"
+            else:
+                start_time = time.perf_counter()
+                logits = self._full_logits(self._transform_array(image_np, self.transform))[0]
+                full_ms = (time.perf_counter() - start_time) * 1000
+            
+            with self._cascade_lock:
+                self._cascade_stats["total"] += 1
+                self._cascade_stats["short_circuited"] += int(short_circuited)
+                self._cascade_stats["screening_time_ms"] += screening_ms
+                self._cascade_stats["full_time_ms"] += full_ms
+        elif tta != 'always':
+            logits = self._full_logits(self._transform_array(image_np, self.transform))[0]
+        
+        uncertainty = None
+        if logits is not None:
+            probabilities = self._sigmoid(logits)
+        
+        # Confident negatives from the cascade never pay for TTA
+        if stage == "full" and (tta == 'always' or (tta == 'auto' and self._needs_tta(probabilities))):
+            # Reuse the first-pass logits as the identity view when we have them
+            batch = self._build_tta_batch(image_np, include_identity=logits is None)
+            view_logits = self._full_logits(batch)
+            if logits is not None:
+                view_logits = np.concatenate([logits[np.newaxis], view_logits], axis=0)
+            
+            # Aggregate in logit space, report spread in probability space
+            probabilities = self._sigmoid(view_logits.mean(axis=0))
+            variance = self._sigmoid(view_logits).var(axis=0)
+            uncertainty = {
+                "num_views": int(view_logits.shape[0]),
+                "variance": {
+                    label: round(float(v), 6)
+                    for label, v in zip(LABELS, variance)
+                }
+            }
+        
+        predictions, highest_urgency = self._build_predictions(probabilities, threshold)
+        
+        return {
+            "predictions": predictions,
+            "urgency_tier": highest_urgency,
+            "probabilities": probabilities,
+            "stage": stage,
+            "tta_applied": uncertainty is not None,
+            "uncertainty": uncertainty,
+        }
+    
+    def analyze_batch(
+        self,
+        images: Sequence[np.ndarray],
+        threshold: float = 0.5,
+        cascade: Optional[bool] = None
+    ) -> List[Dict[str, any]]:
+        """
+        Run a batch of decoded images through one batched ONNX call per stage
+        
+        With the cascade, the whole batch is screened at once and only films that
+        are not confidently negative are stacked for the full model.
+        
+        Args:
+            images: Pixel arrays, each (H, W), (H, W, 1) or (H, W, 3), uint8 or uint16
+            threshold: Minimum confidence score to include in results
+            cascade: Force cascade on/off (default: service setting)
+            
+        Returns:
+            List of `analyze`-style dicts, one per image (no TTA)
+        """
+        images = [self._to_rgb(image_np) for image_np in images]
+        if not images:
+            return []
+        
+        use_cascade = self.cascade_enabled if cascade is None else cascade
+        use_cascade = use_cascade and self.screening_session is not None
+        
+        probabilities = [None] * len(images)
+        stages = ["full"] * len(images)
+        remaining = list(range(len(images)))
+        
+        if use_cascade:
+            start_time = time.perf_counter()
+            batch = np.concatenate([self._transform_array(im, self.screening_transform) for im in images])
+            screening_logits = self.screening_session.run(
+                [self.screening_output_name],
+                {self.screening_input_name: batch},
+                memory_profiler.run_options()
+            )[0]
+            screening_ms = (time.perf_counter() - start_time) * 1000
+            
+            remaining = []
+            for idx, logits in enumerate(screening_logits):
+                probs = self._sigmoid(logits)
+                if self._is_confident_negative(probs, threshold):
+                    probabilities[idx] = probs
+                    stages[idx] = "screening"
+                else:
+                    remaining.append(idx)
+        
+        full_ms = 0.0
+        if remaining:
+            start_time = time.perf_counter()
+            batch = np.concatenate([self._transform_array(images[idx], self.transform) for idx in remaining])
+            for idx, logits in zip(remaining, self._full_logits(batch)):
+                probabilities[idx] = self._sigmoid(logits)
+            full_ms = (time.perf_counter() - start_time) * 1000
+        
+        if use_cascade:
+            with self._cascade_lock:
+                self._cascade_stats["total"] += len(images)
+                self._cascade_stats["short_circuited"] += len(images) - len(remaining)
+                self._cascade_stats["screening_time_ms"] += screening_ms
+                self._cascade_stats["full_time_ms"] += full_ms
+        
+        results = []
+        for probs, stage in zip(probabilities, stages):
+            predictions, highest_urgency = self._build_predictions(probs, threshold)
+            results.append({
+                "predictions": predictions,
+                "urgency_tier": highest_urgency,
+                "probabilities": probs,
+                "stage": stage,
+                "tta_applied": False,
+                "uncertainty": None,
+            })
+        return results
+    
+    def predict(
+        self,
+        image_bytes: bytes,
+        threshold: float = 0.5,
+        cascade: Optional[bool] = None,
+        tta: str = 'off'
+    ) -> Tuple[List[Dict[str, any]], str]:
+        """
+        Run ONNX inference and return predictions with clinical urgency classification
         
-        # Build predictions with clinical urgency
+        Args:
+            image_bytes: Raw image bytes
+            threshold: Minimum confidence score to include in results
+            cascade: Force screening cascade on/off (default: service setting)
+            tta: Test-time augmentation mode ('off' | 'auto' | 'always')
+            
+        Returns:
+            Tuple of (predictions list, overall_urgency_tier)
+        """
+        result = self.analyze(image_bytes, threshold=threshold, cascade=cascade, tta=tta)
+        return result["predictions"], result["urgency_tier"]
+    
+    @classmethod
+    def _build_predictions(
+        cls,
+        probabilities: np.ndarray,
+        threshold: float
+    ) -> Tuple[List[Dict[str, any]], str]:
+        """Build thresholded predictions sorted by clinical urgency"""
+        # Build predictions with clinical urgency; convert to Python floats once
+        # and only visit labels above threshold
+        scores = probabilities.tolist()
+        confidence_pcts = np.round(probabilities * 100, 2).tolist()
         predictions = []
         highest_urgency = 'routine'  # Default if no findings
         
-        for idx, (label, score) in enumerate(zip(LABELS, probabilities)):
-            if score >= threshold:
-                severity = self._classify_severity(score)
-                urgency_tier = URGENCY_TIERS.get(label, 'routine')
-                
-                predictions.append({
-                    "label": label,
-                    "score": float(score),
-                    "severity": severity,
-                    "urgency_tier": urgency_tier,
-                    "confidence_pct": float(round(score * 100, 2))
-                })
-                
-                # Track highest urgency for case-level triage
-                if URGENCY_PRIORITY.get(urgency_tier, 2) < URGENCY_PRIORITY.get(highest_urgency, 2):
-                    highest_urgency = urgency_tier
+        for idx in np.flatnonzero(probabilities >= threshold).tolist():
+            label, score = LABELS[idx], scores[idx]
+            urgency_tier = URGENCY_TIERS.get(label, 'routine')
+            
+            predictions.append({
+                "label": label,
+                "score": score,
+                "severity": cls._classify_severity(score),
+                "urgency_tier": urgency_tier,
+                "confidence_pct": confidence_pcts[idx]
+            })
+            
+            # Track highest urgency for case-level triage
+            if URGENCY_PRIORITY.get(urgency_tier, 2) < URGENCY_PRIORITY.get(highest_urgency, 2):
+                highest_urgency = urgency_tier
         
         # Sort by urgency first, then by score (descending)
         predictions.sort(
@@ -172,6 +583,111 @@ class ModelService:
         
         return predictions, highest_urgency
     
+    def get_cascade_metrics(self) -> Dict[str, any]:
+        """Return screening cascade counters (fraction short-circuited, stage timings)"""
+        with self._cascade_lock:
+            stats = dict(self._cascade_stats)
+        
+        total = stats["total"]
+        full_runs = total - stats["short_circuited"]
+        return {
+            "enabled": self.cascade_enabled,
+            "screening_loaded": self.screening_session is not None,
+            "bounds": dict(self.cascade_bounds),
+            "total": total,
+            "short_circuited": stats["short_circuited"],
+            "short_circuit_fraction": round(stats["short_circuited"] / total, 4) if total else 0.0,
+            "avg_screening_time_ms": round(stats["screening_time_ms"] / total, 2) if total else 0.0,
+            "avg_full_time_ms": round(stats["full_time_ms"] / full_runs, 2) if full_runs else 0.0,
+        }
+    
+    def evaluate_cascade(
+        self,
+        images: Iterable[bytes],
+        threshold: float = 0.5,
+        ground_truth: Optional[List[List[str]]] = None
+    ) -> Dict[str, any]:
+        """
+        Evaluate the sensitivity cost of the screening cascade
+        
+        Every image is scored by BOTH stages. Positives are taken from the full
+        model at `threshold` (and from `ground_truth` labels when provided); a
+        positive is "missed" when the screening stage would have short-circuited it.
+        
+        Args:
+            images: Iterable of raw image bytes
+            threshold: Prediction threshold (same semantics as `predict`)
+            ground_truth: Optional list of true label names per image
+            
+        Returns:
+            Dict with short-circuit fraction and per-class / per-tier sensitivity cost
+        """
+        if self.screening_session is None:
+            raise RuntimeError("Screening model not loaded; cannot evaluate cascade")
+        
+        def empty_counts():
+            return {label: {"positives": 0, "missed": 0} for label in LABELS}
+        
+        vs_full = empty_counts()
+        vs_truth = empty_counts() if ground_truth is not None else None
+        num_images = 0
+        num_short_circuited = 0
+        
+        for idx, image_bytes in enumerate(images):
+            image_np = self._to_rgb(self._decode_image(image_bytes))
+            screening_probs = self._run_screening(image_np)
+            full_probs = self._run_full(image_np)
+            short_circuited = self._is_confident_negative(screening_probs, threshold)
+            
+            num_images += 1
+            num_short_circuited += int(short_circuited)
+            
+            for label, score in zip(LABELS, full_probs):
+                if score >= threshold:
+                    vs_full[label]["positives"] += 1
+                    vs_full[label]["missed"] += int(short_circuited)
+            
+            if vs_truth is not None:
+                for label in ground_truth[idx]:
+                    if label in vs_truth:
+                        # Only count findings the full model would have caught
+                        detected = full_probs[LABELS.index(label)] >= threshold
+                        vs_truth[label]["positives"] += int(detected)
+                        vs_truth[label]["missed"] += int(detected and short_circuited)
+        
+        def summarize(counts):
+            per_class = {}
+            per_tier = {tier: {"positives": 0, "missed": 0} for tier in URGENCY_PRIORITY}
+            for label, c in counts.items():
+                tier = URGENCY_TIERS.get(label, 'routine')
+                per_tier[tier]["positives"] += c["positives"]
+                per_tier[tier]["missed"] += c["missed"]
+                per_class[label] = {
+                    **c,
+                    "urgency_tier": tier,
+                    "sensitivity_cost": round(c["missed"] / c["positives"], 4) if c["positives"] else 0.0
+                }
+            for c in per_tier.values():
+                c["sensitivity_cost"] = round(c["missed"] / c["positives"], 4) if c["positives"] else 0.0
+            return {"per_class": per_class, "per_tier": per_tier}
+        
+        report = {
+            "num_images": num_images,
+            "threshold": threshold,
+            "bounds": dict(self.cascade_bounds),
+            "short_circuited": num_short_circuited,
+            "short_circuit_fraction": round(num_short_circuited / num_images, 4) if num_images else 0.0,
+            "vs_full_model": summarize(vs_full),
+        }
+        if vs_truth is not None:
+            report["vs_ground_truth"] = summarize(vs_truth)
+        
+        critical_missed = report["vs_full_model"]["per_tier"]["critical"]["missed"]
+        if critical_missed:
+            print(f"[ModelService] WARNING: cascade missed {critical_missed} critical-tier positives")
+        
+        return report
+    
     @staticmethod
     def _sigmoid(x: np.ndarray) -> np.ndarray:
         """Apply sigmoid activation to logits"""
@@ -203,16 +719,21 @@ class ModelService:
             "preprocessing": {
                 "resize": "224x224",
                 "normalization": "ImageNet (mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])"
+            },
+            "cascade": {
+                "enabled": self.cascade_enabled,
+                "screening_input_size": self.screening_input_size if self.screening_session is not None else None,
+                "bounds": dict(self.cascade_bounds)
+            },
+            "tta": {
+                "views": ["identity"] + (["hflip"] if TTA_FLIP else []) + [f"scale_{size}" for size in TTA_SCALES],
+                "uncertainty_band": list(self.tta_band),
+                "tiers": list(self.tta_tiers)
             }
         }
 
 
-# Singleton instance
-_model_service = None
-
 def get_model_service() -> ModelService:
-    """Get or create ModelService singleton"""
-    global _model_service
-    if _model_service is None:
-        _model_service = ModelService()
-    return _model_service
+    """Get the ModelService of the active version in the model registry"""
+    from .model_registry import get_model_registry
+    return get_model_registry().active.service
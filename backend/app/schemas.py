@@ -0,0 +1,109 @@
+"""
+Response Schemas for Krida LungVision AI Service
+Typed models for the OpenAPI docs; responses are serialized directly by
+app.serialization (orjson/msgpack) rather than validated through FastAPI
+"""
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class Prediction(BaseModel):
+    label: str
+    score: float
+    severity: str            # high | medium | low
+    urgency_tier: str        # critical | moderate | routine
+    confidence_pct: float
+
+
+class LatencyStats(BaseModel):
+    count: int
+    avg_ms: float
+    p50_ms: float
+    p95_ms: float
+    max_ms: float
+
+
+class ModelInfo(BaseModel):
+    name: str
+    num_classes: int
+    version: str
+    latency: Dict[str, LatencyStats]  # per stage: inference | inference:batch | gradcam
+    threshold: Optional[float] = None
+
+
+class Uncertainty(BaseModel):
+    num_views: int
+    variance: Dict[str, float]
+
+
+class PredictResult(BaseModel):
+    """Per-image body (top level for one image, `results` items for a batch)"""
+    predictions: List[Prediction]
+    urgency_tier: str
+    stage: str               # screening | full
+    tta_applied: bool
+    uncertainty: Optional[Uncertainty] = None
+
+
+class CompactPredictResult(BaseModel):
+    """`format=compact`: scores aligned with the `labels` of /api/model/info"""
+    scores: List[float]
+    urgency_tier: str
+    stage: str
+    uncertainty: Optional[Uncertainty] = None  # only when TTA ran
+
+
+class PredictResponse(PredictResult):
+    success: bool
+    inference_time_ms: float
+    model_info: ModelInfo
+
+
+class CompactPredictResponse(CompactPredictResult):
+    success: bool
+    inference_time_ms: float
+    model_info: ModelInfo
+
+
+class BatchPredictResponse(BaseModel):
+    success: bool
+    batch_size: int
+    results: List[PredictResult]
+    inference_time_ms: float
+    model_info: ModelInfo
+
+
+class CompactBatchPredictResponse(BaseModel):
+    success: bool
+    batch_size: int
+    results: List[CompactPredictResult]
+    inference_time_ms: float
+    model_info: ModelInfo
+
+
+class GradCAMResult(BaseModel):
+    heatmap_base64: str
+    target_class: str
+    target_class_idx: int
+    confidence: float
+    all_predictions: Optional[Dict[str, float]] = None
+    all_scores: Optional[List[float]] = None  # compact form, aligned with /api/model/info labels
+
+
+class PredictWithGradCAMResponse(BaseModel):
+    success: bool
+    predictions: Optional[List[Prediction]] = None
+    scores: Optional[List[float]] = None      # compact form
+    urgency_tier: str
+    stage: str               # always "full" (the cascade is bypassed for Grad-CAM)
+    inference_time_ms: float
+    gradcam: GradCAMResult
+    model_info: ModelInfo
+
+
+class GradCAMResponse(BaseModel):
+    success: bool
+    gradcam: GradCAMResult
+    generation_time_ms: float
+    model_info: ModelInfo
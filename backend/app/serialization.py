@@ -0,0 +1,74 @@
+"""
+Response Serialization for Krida LungVision AI Service
+Accept-header negotiated fast path: msgpack > orjson > stdlib json
+"""
+import json
+import time
+from typing import Any, Optional
+
+import numpy as np
+from fastapi.responses import Response
+
+from .metrics import stage_metrics
+
+# orjson and msgpack are optional; without them responses fall back to stdlib json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _default(obj: Any):
+    """Encode NumPy scalars/arrays for msgpack and stdlib json"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the response media type from an Accept header"""
+    if accept and msgpack is not None:
+        for part in accept.split(","):
+            if part.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES:
+                return MSGPACK_MEDIA_TYPES[0]
+    return JSON_MEDIA_TYPE
+
+
+def serialize(payload: Any, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """Serialize a response payload to bytes in `media_type`"""
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return msgpack.packb(payload, default=_default, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def render(payload: Any, accept: Optional[str] = None, status_code: int = 200) -> Response:
+    """
+    Build the HTTP response, bypassing FastAPI's response_model validation
+
+    Serialization time is recorded in the stage metrics (as `serialize:<format>`)
+    and returned in the `X-Serialization-Time-Ms` header.
+    """
+    media_type = negotiate(accept)
+    start_time = time.perf_counter()
+    body = serialize(payload, media_type)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    fmt = "msgpack" if media_type in MSGPACK_MEDIA_TYPES else ("orjson" if orjson is not None else "json")
+    stage_metrics.record(f"serialize:{fmt}", elapsed_ms)
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type=media_type,
+        headers={"X-Serialization-Time-Ms": f"{elapsed_ms:.3f}"}
+    )
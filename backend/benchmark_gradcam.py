@@ -0,0 +1,126 @@
+"""
+Grad-CAM Backend Benchmark
+Compares the eager pytorch_grad_cam path with the tuned CPU backend(s)
+and checks numerical parity of the heatmaps
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app.gradcam_service import GradCAMService, LABELS
+
+NUM_CLASSES = len(LABELS)
+
+# Heatmaps are min-max scaled to [0, 1]; fp32 paths must agree within this
+CAM_TOLERANCE_FP32 = 1e-2
+# BF16 trunks trade precision for speed; only a loose agreement is expected
+CAM_TOLERANCE_BF16 = 1e-1
+
+
+def synthetic_xray(seed: int, size: int = 512) -> bytes:
+    """Generate a chest-X-ray-like grayscale PNG (two lung fields + noise)"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size] / size
+    image = 0.6 * np.exp(-((xx - 0.5) ** 2) / 0.08)  # mediastinum
+    for cx in (0.3, 0.7):
+        image -= 0.35 * np.exp(-(((xx - cx) ** 2) / 0.015 + ((yy - 0.5) ** 2) / 0.06))  # lung fields
+    image += 0.05 * rng.standard_normal((size, size))
+    image = np.clip((image - image.min()) / (image.max() - image.min()), 0, 1)
+
+    buffered = io.BytesIO()
+    Image.fromarray((image * 255).astype(np.uint8), mode="L").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def time_backend(service: GradCAMService, inputs, runs: int):
+    """Return (latencies_ms, cams, probabilities) for `runs` passes over all inputs
+
+    Timing uses the production default target (highest probability class); parity
+    CAMs are collected for every class since some classes give an all-zero CAM.
+    """
+    latencies = []
+    for _ in range(runs):
+        for input_tensor in inputs:
+            start_time = time.perf_counter()
+            service.compute_cam(input_tensor)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+
+    cams, probs = [], []
+    for input_tensor in inputs:
+        for class_idx in range(NUM_CLASSES):
+            cam, probabilities, _ = service.compute_cam(input_tensor, target_class_idx=class_idx)
+            cams.append(cam)
+        probs.append(np.asarray(probabilities))
+    return np.array(latencies), cams, probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Grad-CAM backends")
+    parser.add_argument("--model", default="models/best_model_finetuned.pth")
+    parser.add_argument("--images", type=int, default=4, help="Number of synthetic X-rays")
+    parser.add_argument("--runs", type=int, default=5, help="Timed passes over all images")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--compile", action="store_true", help="Also benchmark torch.compile")
+    parser.add_argument("--bf16", action="store_true", help="Also benchmark BF16 autocast")
+    parser.add_argument("--onnx", default=None,
+                        help="Also benchmark the ONNX Grad-CAM graph (e.g. models/gradcam_model.onnx)")
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"❌ Error: Model file not found at {args.model}")
+        sys.exit(1)
+
+    configs = [
+        ("eager (pytorch_grad_cam)", dict(backend="eager"), None),
+        ("optimized, channels-last", dict(backend="optimized", compile_mode="none"), CAM_TOLERANCE_FP32),
+        ("optimized, frozen trunk", dict(backend="optimized", compile_mode="freeze"), CAM_TOLERANCE_FP32),
+    ]
+    if args.compile:
+        configs.append(("optimized, torch.compile", dict(backend="optimized", compile_mode="compile"), CAM_TOLERANCE_FP32))
+    if args.bf16:
+        configs.append(("optimized, frozen + BF16", dict(backend="optimized", compile_mode="freeze", bf16=True), CAM_TOLERANCE_BF16))
+    if args.onnx:
+        configs.append(("onnx runtime", dict(backend="onnx", model_path=args.onnx), CAM_TOLERANCE_FP32))
+
+    images = [synthetic_xray(seed) for seed in range(args.images)]
+    print(f"[1/2] Benchmarking {len(configs)} backends on {len(images)} images x {args.runs} runs")
+
+    results = []
+    for name, kwargs, tolerance in configs:
+        kwargs = {"model_path": args.model, **kwargs}
+        if kwargs["backend"] != "onnx":
+            kwargs["num_threads"] = args.threads
+        service = GradCAMService(**kwargs)
+        inputs = [service.preprocess_image(image_bytes)[0] for image_bytes in images]
+        service.compute_cam(inputs[0])  # warm-up
+        latencies, cams, probs = time_backend(service, inputs, args.runs)
+        results.append((name, tolerance, latencies, cams, probs))
+
+    print("\n[2/2] Results")
+    print(f"   {'backend':<28} {'mean ms':>9} {'p50 ms':>9} {'speedup':>8} {'max |Δcam|':>11} {'max |Δprob|':>12}")
+    _, _, ref_latencies, ref_cams, ref_probs = results[0]
+    failed = False
+    for name, tolerance, latencies, cams, probs in results:
+        cam_diff = max(float(np.abs(c - r).max()) for c, r in zip(cams, ref_cams))
+        prob_diff = max(float(np.abs(p - r).max()) for p, r in zip(probs, ref_probs))
+        speedup = ref_latencies.mean() / latencies.mean()
+        status = ""
+        if tolerance is not None and cam_diff > tolerance:
+            status = "  ❌ parity"
+            failed = True
+        print(f"   {name:<28} {latencies.mean():>9.1f} {np.median(latencies):>9.1f} "
+              f"{speedup:>7.2f}x {cam_diff:>11.2e} {prob_diff:>12.2e}{status}")
+
+    if failed:
+        print("\n❌ Heatmap parity check failed")
+        sys.exit(1)
+    print("\n✅ Heatmap parity within tolerance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Response Serialization Benchmark
+Compares FastAPI's default response_model=Dict path with the orjson/msgpack
+fast path and the compact score-vector form, per call and at high request rates
+"""
+import argparse
+import base64
+import json
+import time
+from typing import Dict
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app import serialization
+from app.model_service import LABELS, ModelService
+
+HEATMAP_BYTES = 150 * 1024  # typical 224x224 PNG overlay
+
+
+def build_result(seed: int = 0) -> Dict:
+    """A representative ModelService.analyze result (no model needed)"""
+    rng = np.random.default_rng(seed)
+    probabilities = rng.random(len(LABELS)).astype(np.float32)
+    predictions, urgency = ModelService._build_predictions(probabilities, 0.3)
+    return {"probabilities": probabilities, "predictions": predictions, "urgency_tier": urgency}
+
+
+def build_payload(result: Dict, compact: bool, with_gradcam: bool) -> Dict:
+    payload = {"success": True, "urgency_tier": result["urgency_tier"], "stage": "full"}
+    if compact:
+        payload["scores"] = result["probabilities"]
+    else:
+        payload["predictions"] = result["predictions"]
+        payload["tta_applied"] = False
+        payload["uncertainty"] = None
+    if with_gradcam:
+        heatmap = base64.b64encode(np.random.bytes(HEATMAP_BYTES)).decode("utf-8")
+        gradcam = {
+            "heatmap_base64": f"data:image/png;base64,{heatmap}",
+            "target_class": "Mass",
+            "target_class_idx": 4,
+            "confidence": 0.91,
+        }
+        if compact:
+            gradcam["all_scores"] = result["probabilities"].tolist()
+        else:
+            gradcam["all_predictions"] = {label: float(p) for label, p in zip(LABELS, result["probabilities"])}
+        payload["gradcam"] = gradcam
+    payload["inference_time_ms"] = 41.7
+    payload["model_info"] = {
+        "name": "DenseNet121", "num_classes": 13, "version": "v1", "threshold": 0.3,
+        "latency": {"inference": {"count": 1000, "avg_ms": 40.1, "p50_ms": 39.5, "p95_ms": 48.2, "max_ms": 61.0}},
+    }
+    return payload
+
+
+def fastapi_default(payload: Dict) -> bytes:
+    """What the old endpoints paid: jsonable_encoder walk + stdlib json (JSONResponse)"""
+    return json.dumps(jsonable_encoder(payload, custom_encoder={np.ndarray: np.ndarray.tolist})).encode("utf-8")
+
+
+def time_call(fn, payload, iterations: int) -> float:
+    """Mean microseconds per call"""
+    fn(payload)
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        fn(payload)
+    return (time.perf_counter() - start_time) / iterations * 1e6
+
+
+def bench_encoders(iterations: int):
+    result = build_result()
+    encoders = [
+        ("fastapi default (Dict)", fastapi_default),
+        ("stdlib json", lambda p: json.dumps(p, default=serialization._default, separators=(",", ":")).encode("utf-8")),
+    ]
+    if serialization.orjson is not None:
+        encoders.append(("orjson", lambda p: serialization.serialize(p, serialization.JSON_MEDIA_TYPE)))
+    if serialization.msgpack is not None:
+        encoders.append(("msgpack", lambda p: serialization.serialize(p, serialization.MSGPACK_MEDIA_TYPES[0])))
+
+    print(f"[1/2] Encoder cost ({iterations} iterations)")
+    print(f"   {'payload':<22} {'encoder':<24} {'µs/call':>10} {'bytes':>9} {'speedup':>8}")
+    for name, compact, with_gradcam in [
+        ("predict full", False, False),
+        ("predict compact", True, False),
+        ("gradcam full", False, True),
+        ("gradcam compact", True, True),
+    ]:
+        payload = build_payload(result, compact, with_gradcam)
+        baseline = None
+        for encoder_name, fn in encoders:
+            us = time_call(fn, payload, iterations)
+            baseline = baseline or us
+            print(f"   {name:<22} {encoder_name:<24} {us:>10.1f} {len(fn(payload)):>9} {baseline / us:>7.2f}x")
+
+
+def bench_requests(requests: int):
+    """In-process request rate: response_model=Dict vs render() with Accept negotiation"""
+    result = build_result()
+    full = build_payload(result, compact=False, with_gradcam=False)
+    compact = build_payload(result, compact=True, with_gradcam=False)
+
+    app = FastAPI()
+
+    @app.get("/default", response_model=Dict)
+    def default():
+        return full
+
+    @app.get("/fast")
+    def fast(request: Request, format: str = "full"):
+        return serialization.render(compact if format == "compact" else full, request.headers.get("accept"))
+
+    print(f"\n[2/2] In-process request rate ({requests} requests each)")
+    print(f"   {'path':<34} {'req/s':>9} {'µs/req':>9}")
+    with TestClient(app) as client:
+        for name, url, accept in [
+            ("response_model=Dict", "/default", None),
+            ("render (orjson)", "/fast", None),
+            ("render (msgpack)", "/fast", "application/msgpack"),
+            ("render compact (orjson)", "/fast?format=compact", None),
+        ]:
+            headers = {"accept": accept} if accept else {}
+            client.get(url, headers=headers)
+            start_time = time.perf_counter()
+            for _ in range(requests):
+                client.get(url, headers=headers)
+            elapsed = time.perf_counter() - start_time
+            print(f"   {name:<34} {requests / elapsed:>9.0f} {elapsed / requests * 1e6:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--iterations", type=int, default=2000, help="Encoder calls per measurement")
+    parser.add_argument("--requests", type=int, default=2000, help="In-process requests per path")
+    args = parser.parse_args()
+
+    bench_encoders(args.iterations)
+    bench_requests(args.requests)
+
+
+if __name__ == "__main__":
+    main()
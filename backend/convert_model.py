@@ -27,6 +27,39 @@ def create_model_architecture():
     model.classifier = nn.Linear(num_features, NUM_CLASSES)
     return model
 
+class GradCAMExportModel(nn.Module):
+    """
+    DenseNet121 wrapper that also returns Grad-CAM inputs
+    
+    Outputs logits, denseblock4 activations and d(logit[class_index]) / d(activations).
+    The gradient is computed in closed form through the eval-mode head
+    (norm5 → ReLU → global average pool → Linear), so the graph exports as
+    plain forward ops and onnxruntime needs no autograd support.
+    A negative class_index selects the highest-scoring class.
+    """
+    
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        features = list(model.features.children())
+        self.trunk = nn.Sequential(*features[:-1])  # up to and including denseblock4
+        self.norm5 = model.features.norm5
+        self.classifier = model.classifier
+        with torch.no_grad():
+            bn_scale = self.norm5.weight / torch.sqrt(self.norm5.running_var + self.norm5.eps)
+        self.register_buffer("bn_scale", bn_scale.detach().clone())
+    
+    def forward(self, x: torch.Tensor, class_index: torch.Tensor):
+        activations = self.trunk(x)
+        normed = self.norm5(activations)
+        pooled = torch.relu(normed).mean(dim=(2, 3))
+        logits = self.classifier(pooled)
+        
+        class_index = torch.where(class_index < 0, logits.argmax(dim=1), class_index)
+        spatial = activations.shape[2] * activations.shape[3]
+        coef = self.classifier.weight[class_index] * self.bn_scale / spatial  # (batch, 1024)
+        gradients = (normed > 0).to(activations.dtype) * coef[:, :, None, None]
+        return logits, activations, gradients
+
 def convert_to_onnx(
     pytorch_model_path: str = "models/best_model_finetuned.pth",
     onnx_model_path: str = "models/best_model.onnx",
@@ -98,8 +131,139 @@ def convert_to_onnx(
     assert outputs[0].shape == (1, NUM_CLASSES), "Output shape mismatch!"
     print("   ✅ Inference test passed")
 
+def convert_screening_model(
+    pytorch_model_path: str = "models/best_model_finetuned.pth",
+    onnx_model_path: str = "models/screening_model.onnx",
+    input_size: int = 128,
+    opset_version: int = 14
+):
+    """
+    Export the first-stage screening model for the ModelService cascade
+    
+    DenseNet121 ends in adaptive pooling, so the same trained weights can be run
+    at a lower resolution (~3x fewer FLOPs at 128x128). A distilled small model
+    can be dropped in instead as long as it outputs (batch, 13) logits.
+    
+    Args:
+        pytorch_model_path: Path to .pth file (full model or distilled student)
+        onnx_model_path: Output path for the screening .onnx file
+        input_size: Square input resolution of the screening pass
+        opset_version: ONNX opset version
+    """
+    print(f"[1/3] Loading PyTorch model from {pytorch_model_path}")
+    
+    model = create_model_architecture()
+    checkpoint = torch.load(pytorch_model_path, map_location=torch.device('cpu'))
+    model.load_state_dict(checkpoint)
+    model.eval()
+    
+    dummy_input = torch.randn(1, 3, input_size, input_size)
+    
+    print(f"[2/3] Exporting screening model at {input_size}x{input_size} (opset {opset_version})...")
+    torch.onnx.export(
+        model,
+        dummy_input,
+        onnx_model_path,
+        export_params=True,
+        opset_version=opset_version,
+        do_constant_folding=True,
+        input_names=['input'],
+        output_names=['output'],
+        dynamic_axes={
+            'input': {0: 'batch_size'},
+            'output': {0: 'batch_size'}
+        }
+    )
+    
+    print(f"[3/3] Validating screening model...")
+    onnx_model = onnx.load(onnx_model_path)
+    onnx.checker.check_model(onnx_model)
+    
+    import onnxruntime as ort
+    session = ort.InferenceSession(onnx_model_path)
+    outputs = session.run(None, {'input': dummy_input.numpy()})
+    assert outputs[0].shape == (1, NUM_CLASSES), "Output shape mismatch!"
+    
+    print("\n✅ Screening model exported!")
+    print(f"   Output path: {onnx_model_path}")
+    print(f"   Input shape: (batch, 3, {input_size}, {input_size})")
+
+def convert_gradcam_model(
+    pytorch_model_path: str = "models/best_model_finetuned.pth",
+    onnx_model_path: str = "models/gradcam_model.onnx",
+    opset_version: int = 14
+):
+    """
+    Export the Grad-CAM graph so explanations can be served without PyTorch
+    
+    Inputs: input (batch, 3, 224, 224), class_index (batch,) int64 (-1 = top class)
+    Outputs: logits (batch, 13), activations / gradients (batch, 1024, 7, 7)
+    
+    Args:
+        pytorch_model_path: Path to .pth file
+        onnx_model_path: Output path for the Grad-CAM .onnx file
+        opset_version: ONNX opset version
+    """
+    print(f"[1/3] Loading PyTorch model from {pytorch_model_path}")
+    
+    model = create_model_architecture()
+    checkpoint = torch.load(pytorch_model_path, map_location=torch.device('cpu'))
+    model.load_state_dict(checkpoint)
+    model.eval()
+    export_model = GradCAMExportModel(model).eval()
+    
+    dummy_input = torch.randn(1, 3, 224, 224)
+    dummy_index = torch.tensor([-1], dtype=torch.int64)
+    
+    print(f"[2/3] Exporting Grad-CAM graph (opset {opset_version})...")
+    torch.onnx.export(
+        export_model,
+        (dummy_input, dummy_index),
+        onnx_model_path,
+        export_params=True,
+        opset_version=opset_version,
+        do_constant_folding=True,
+        input_names=['input', 'class_index'],
+        output_names=['logits', 'activations', 'gradients'],
+        dynamic_axes={
+            'input': {0: 'batch_size'},
+            'class_index': {0: 'batch_size'},
+            'logits': {0: 'batch_size'},
+            'activations': {0: 'batch_size'},
+            'gradients': {0: 'batch_size'}
+        }
+    )
+    
+    print(f"[3/3] Validating Grad-CAM graph...")
+    onnx_model = onnx.load(onnx_model_path)
+    onnx.checker.check_model(onnx_model)
+    
+    import onnxruntime as ort
+    session = ort.InferenceSession(onnx_model_path)
+    logits, activations, gradients = session.run(
+        None, {'input': dummy_input.numpy(), 'class_index': dummy_index.numpy()}
+    )
+    assert logits.shape == (1, NUM_CLASSES), "Logits shape mismatch!"
+    assert activations.shape == gradients.shape == (1, 1024, 7, 7), "Activation/gradient shape mismatch!"
+    
+    print("\n✅ Grad-CAM graph exported!")
+    print(f"   Output path: {onnx_model_path}")
+    print(f"   Outputs: logits {logits.shape}, activations/gradients {activations.shape}")
+
 if __name__ == "__main__":
     import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Convert DenseNet121 checkpoint to ONNX")
+    parser.add_argument("--screening", action="store_true",
+                        help="Also export the low-resolution screening model for the cascade")
+    parser.add_argument("--screening-size", type=int, default=128,
+                        help="Input resolution of the screening model (default: 128)")
+    parser.add_argument("--screening-checkpoint", default=None,
+                        help="Optional distilled .pth for the screening stage (default: main checkpoint)")
+    parser.add_argument("--gradcam", action="store_true",
+                        help="Also export the Grad-CAM graph (serves heatmaps without PyTorch)")
+    args = parser.parse_args()
     
     # Use best_model_finetuned.pth as source
     pth_path = "best_model_finetuned.pth" if Path("best_model_finetuned.pth").exists() else "models/best_model_finetuned.pth"
@@ -115,3 +279,16 @@ if __name__ == "__main__":
         pytorch_model_path=pth_path,
         onnx_model_path="models/best_model.onnx"
     )
+    
+    if args.screening:
+        convert_screening_model(
+            pytorch_model_path=args.screening_checkpoint or pth_path,
+            onnx_model_path="models/screening_model.onnx",
+            input_size=args.screening_size
+        )
+    
+    if args.gradcam:
+        convert_gradcam_model(
+            pytorch_model_path=pth_path,
+            onnx_model_path="models/gradcam_model.onnx"
+        )
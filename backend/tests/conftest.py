@@ -0,0 +1,89 @@
+"""
+Shared Test Fixtures
+Synthetic chest X-rays and randomly initialised models exported once per session
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from xray_samples import encode_png, synthetic_xray
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: latency/throughput budget (deselect with -m 'not perf')")
+
+
+@pytest.fixture(scope="session")
+def xray_png():
+    """A 1024x1024 8-bit synthetic film, PNG-encoded"""
+    return encode_png(synthetic_xray())
+
+
+@pytest.fixture(scope="session")
+def exported_models(tmp_path_factory):
+    """
+    Randomly initialised DenseNet121 checkpoint and its ONNX exports
+    (classifier and Grad-CAM graph), shared by the whole session
+
+    Returns:
+        Dict with "pth", "onnx" and "gradcam_onnx" paths
+    """
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("torchvision")
+    pytest.importorskip("onnx")
+
+    from convert_model import create_model_architecture, convert_to_onnx, convert_gradcam_model
+
+    model_dir = tmp_path_factory.mktemp("models")
+    torch.manual_seed(0)
+    model = create_model_architecture().eval()
+    paths = {
+        "pth": str(model_dir / "model.pth"),
+        "onnx": str(model_dir / "best_model.onnx"),
+        "gradcam_onnx": str(model_dir / "gradcam_model.onnx"),
+    }
+    torch.save(model.state_dict(), paths["pth"])
+    convert_to_onnx(paths["pth"], paths["onnx"])
+    convert_gradcam_model(paths["pth"], paths["gradcam_onnx"])
+    return paths
+
+
+@pytest.fixture(scope="session")
+def model_service(exported_models):
+    from app.model_service import ModelService
+    return ModelService(exported_models["onnx"])
+
+
+@pytest.fixture(scope="session")
+def gradcam_onnx_service(exported_models):
+    from app.gradcam_service import GradCAMService
+    return GradCAMService(exported_models["gradcam_onnx"], backend="onnx")
+
+
+@pytest.fixture(scope="session")
+def api_client(exported_models):
+    """In-process client with the exported test models as the active version"""
+    from fastapi.testclient import TestClient
+    from app import model_registry
+    from app.main import app
+
+    registry = model_registry.ModelRegistry()
+    registry.register(
+        "test",
+        exported_models["onnx"],
+        gradcam_model_path=exported_models["gradcam_onnx"],
+        background=False
+    )
+    registry.activate("test")
+
+    previous = model_registry._model_registry
+    model_registry._model_registry = registry
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        model_registry._model_registry = previous
@@ -0,0 +1,144 @@
+"""
+API Endpoint Tests
+Strict validation of /api/predict-raw uploads, Accept negotiation and the
+compact response form (in-process TestClient)
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import api
+from xray_samples import synthetic_xray
+
+RAW_HEADERS = {"Content-Type": "application/octet-stream"}
+
+
+def _post_raw(client, body: bytes, shape: str, params=None, **headers):
+    return client.post(
+        "/api/predict-raw",
+        params=params,
+        content=body,
+        headers={**RAW_HEADERS, "X-Image-Shape": shape, **headers}
+    )
+
+
+def test_predict_raw_single_and_batch(api_client):
+    image = synthetic_xray(size=(64, 64))
+    response = _post_raw(api_client, image.tobytes(), "64,64")
+    assert response.status_code == 200, response.text
+    assert response.json()["stage"] == "full"
+
+    batch = np.stack([image, image])
+    response = _post_raw(api_client, batch.tobytes(), "2,64,64")
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["batch_size"] == 2
+    assert len(body["results"]) == 2
+
+
+def test_predict_raw_requires_octet_stream(api_client):
+    response = api_client.post(
+        "/api/predict-raw",
+        content=bytes(64 * 64),
+        headers={"Content-Type": "text/plain", "X-Image-Shape": "64,64"}
+    )
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("body_size,shape,headers,detail", [
+    (100, "64,64", {}, "Body is"),                                        # length mismatch
+    (64 * 64 * 4, "64,64", {"X-Image-Dtype": "float32"}, "Invalid dtype"),
+    (16 * 16, "16,16", {}, "Height/width"),                               # side < 32
+    (4097 * 32, "4097,32", {}, "Height/width"),                           # side > 4096
+    (64 * 64 * 2, "64,64,2", {"X-Image-Layout": "HWC"}, "Channels"),
+    (33 * 32 * 32, "33,32,32", {}, "Batch size"),                         # N > 32
+    (64 * 64, "64,64", {"X-Image-Layout": "NHWC"}, "does not match layout"),
+])
+def test_predict_raw_rejects_invalid_input(api_client, body_size, shape, headers, detail):
+    response = _post_raw(api_client, bytes(body_size), shape, **headers)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_predict_raw_rejects_batch_tta(api_client):
+    response = _post_raw(api_client, bytes(2 * 32 * 32), "2,32,32", params={"tta": "auto"})
+    assert response.status_code == 400
+    assert "TTA" in response.json()["detail"]
+
+
+def test_predict_raw_rejects_oversized_body(api_client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_RAW_SIZE", 1024)
+    response = _post_raw(api_client, bytes(64 * 64), "64,64")
+    assert response.status_code == 413
+
+
+def _post_png(client, path: str, image_bytes: bytes, params=None, accept=None):
+    headers = {"Accept": accept} if accept is not None else {}
+    return client.post(path, params=params, headers=headers, files={"file": ("xray.png", image_bytes, "image/png")})
+
+
+@pytest.fixture(scope="module")
+def labels(api_client):
+    return api_client.get("/api/model/info").json()["labels"]
+
+
+def test_msgpack_round_trip(api_client, xray_png):
+    msgpack = pytest.importorskip("msgpack")
+    as_json = _post_png(api_client, "/api/predict", xray_png).json()
+
+    response = _post_png(api_client, "/api/predict", xray_png, accept="application/msgpack")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/msgpack")
+
+    body = msgpack.unpackb(response.content, raw=False)
+    assert body["predictions"] == as_json["predictions"]
+    assert body["urgency_tier"] == as_json["urgency_tier"]
+    assert body["model_info"]["version"] == as_json["model_info"]["version"]
+
+
+@pytest.mark.parametrize("accept", [None, "*/*", "application/json"])
+def test_json_by_default(api_client, xray_png, accept):
+    response = _post_png(api_client, "/api/predict", xray_png, accept=accept)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/json")
+    assert response.json()["success"] is True
+
+
+def test_compact_scores_follow_model_info_labels(api_client, xray_png, labels):
+    full = _post_png(api_client, "/api/predict", xray_png, params={"threshold": 0.0}).json()
+    compact = _post_png(api_client, "/api/predict", xray_png, params={"format": "compact"}).json()
+
+    scores = compact["scores"]
+    assert len(scores) == len(labels) == 13
+    assert "predictions" not in compact
+    for prediction in full["predictions"]:
+        assert scores[labels.index(prediction["label"])] == pytest.approx(prediction["score"], abs=1e-6)
+
+
+def test_compact_gradcam_scores_follow_model_info_labels(api_client, xray_png, labels):
+    full = _post_png(api_client, "/api/predict-with-gradcam", xray_png).json()
+    compact = _post_png(api_client, "/api/predict-with-gradcam", xray_png, params={"format": "compact"}).json()
+
+    all_scores = compact["gradcam"]["all_scores"]
+    assert len(all_scores) == len(labels)
+    assert "all_predictions" not in compact["gradcam"]
+    np.testing.assert_allclose(all_scores, compact["scores"], atol=1e-5)
+    for label, score in zip(labels, all_scores):
+        assert full["gradcam"]["all_predictions"][label] == pytest.approx(score, abs=1e-5)
+
+
+@pytest.mark.parametrize("path", ["/api/predict", "/api/predict-with-gradcam"])
+def test_invalid_format_rejected(api_client, xray_png, path):
+    response = _post_png(api_client, path, xray_png, params={"format": "xml"})
+    assert response.status_code == 400
+    assert "Invalid format" in response.json()["detail"]
+
+
+def test_invalid_format_rejected_raw(api_client):
+    response = _post_raw(api_client, bytes(64 * 64), "64,64", params={"format": "xml"})
+    assert response.status_code == 400
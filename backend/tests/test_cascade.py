@@ -0,0 +1,137 @@
+"""
+Screening Cascade Tests
+Which films skip the full model (bounds, threshold capping) and how
+evaluate_cascade counts the positives the cascade would miss
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.model_service import ModelService, LABELS
+from xray_samples import encode_png, synthetic_xray
+
+
+@pytest.fixture(scope="module")
+def screening_model(exported_models, tmp_path_factory):
+    """Low-resolution screening export of the session checkpoint"""
+    from convert_model import convert_screening_model
+
+    path = str(tmp_path_factory.mktemp("screening") / "screening_model.onnx")
+    convert_screening_model(exported_models["pth"], path, input_size=64)
+    return path
+
+
+@pytest.fixture
+def make_service(exported_models, screening_model):
+    """Build a cascade-enabled ModelService with optional bound overrides"""
+    def make(bounds=None, **kwargs):
+        kwargs.setdefault("cascade_enabled", True)
+        return ModelService(
+            exported_models["onnx"],
+            screening_model_path=screening_model,
+            cascade_bounds=bounds,
+            **kwargs
+        )
+    return make
+
+
+def _scores(**overrides) -> np.ndarray:
+    """Per-class probabilities in LABELS order, zero unless overridden"""
+    probabilities = np.zeros(len(LABELS), dtype=np.float32)
+    for label, score in overrides.items():
+        probabilities[LABELS.index(label)] = score
+    return probabilities
+
+
+def test_cascade_off_by_default(exported_models, screening_model):
+    service = ModelService(exported_models["onnx"], screening_model_path=screening_model)
+    assert service.cascade_enabled is False
+    assert service.analyze_array(synthetic_xray(size=(256, 256)), threshold=0.3)["stage"] == "full"
+
+
+def test_label_bound_overrides_tier_bound(make_service):
+    # Looser label bound than its tier
+    service = make_service({"critical": 0.02, "Mass": 0.2})
+    assert service._is_confident_negative(_scores(Mass=0.1), threshold=0.5)
+    assert not service._is_confident_negative(_scores(Pneumothorax=0.1), threshold=0.5)
+
+    # Tighter label bound than its tier
+    service = make_service({"routine": 0.10, "Nodule": 0.01})
+    assert service._is_confident_negative(_scores(Fibrosis=0.05), threshold=0.5)
+    assert not service._is_confident_negative(_scores(Nodule=0.05), threshold=0.5)
+
+
+def test_threshold_caps_bounds(make_service):
+    service = make_service({"routine": 0.10})
+    assert service._is_confident_negative(_scores(Atelectasis=0.05), threshold=0.5)
+    assert not service._is_confident_negative(_scores(Atelectasis=0.05), threshold=0.01)
+
+    # threshold=0.0 reports every class, so nothing may be short-circuited
+    assert not service._is_confident_negative(_scores(), threshold=0.0)
+
+
+def test_short_circuit_returns_screening_stage(make_service, monkeypatch):
+    service = make_service()
+    monkeypatch.setattr(service, "_run_screening", lambda image_np: _scores() + 0.001)
+
+    def full_model_must_not_run(input_array):
+        raise AssertionError("full model ran on a short-circuited film")
+
+    monkeypatch.setattr(service, "_full_logits", full_model_must_not_run)
+
+    result = service.analyze_array(synthetic_xray(size=(256, 256)), threshold=0.3, tta="always")
+    assert result["stage"] == "screening"
+    assert result["predictions"] == []
+    assert result["urgency_tier"] == "routine"
+    assert result["tta_applied"] is False
+    assert service.get_cascade_metrics()["short_circuited"] == 1
+
+
+def test_no_short_circuit_runs_full_model(make_service, monkeypatch):
+    service = make_service()
+    monkeypatch.setattr(service, "_run_screening", lambda image_np: _scores(Edema=0.3))
+
+    result = service.analyze_array(synthetic_xray(size=(256, 256)), threshold=0.3)
+    assert result["stage"] == "full"
+    assert service.get_cascade_metrics()["short_circuited"] == 0
+
+
+def test_evaluate_cascade_counts_missed_positives(make_service, monkeypatch):
+    service = make_service()
+    # (screening, full) per film: missed critical + routine, caught critical, clean negative
+    films = [
+        (_scores(), _scores(Pneumothorax=0.9, Nodule=0.6)),
+        (_scores(Mass=0.5), _scores(Mass=0.8)),
+        (_scores(), _scores()),
+    ]
+    screening = iter(screening for screening, _ in films)
+    full = iter(full for _, full in films)
+    monkeypatch.setattr(service, "_run_screening", lambda image_np: next(screening))
+    monkeypatch.setattr(service, "_run_full", lambda image_np: next(full))
+
+    images = [encode_png(synthetic_xray(seed=seed, size=(256, 256))) for seed in range(len(films))]
+    report = service.evaluate_cascade(
+        images, threshold=0.5, ground_truth=[["Pneumothorax"], ["Mass", "Edema"], []]
+    )
+
+    assert report["num_images"] == 3
+    assert report["short_circuited"] == 2
+    assert report["short_circuit_fraction"] == pytest.approx(0.6667)
+
+    per_tier = report["vs_full_model"]["per_tier"]
+    assert per_tier["critical"] == {"positives": 2, "missed": 1, "sensitivity_cost": 0.5}
+    assert per_tier["routine"] == {"positives": 1, "missed": 1, "sensitivity_cost": 1.0}
+    assert per_tier["moderate"]["positives"] == 0
+
+    per_class = report["vs_full_model"]["per_class"]
+    assert per_class["Pneumothorax"]["missed"] == 1
+    assert per_class["Mass"]["missed"] == 0
+
+    # Edema is in the ground truth but the full model missed it too: not counted
+    truth_tier = report["vs_ground_truth"]["per_tier"]
+    assert truth_tier["critical"] == {"positives": 2, "missed": 1, "sensitivity_cost": 0.5}
@@ -0,0 +1,71 @@
+"""
+Grad-CAM Backend Parity Tests
+Checks the tuned PyTorch and ONNX Runtime backends against pytorch_grad_cam
+"""
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("pytorch_grad_cam")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.gradcam_service import GradCAMService, LABELS
+
+CAM_TOLERANCE = 1e-3
+
+
+@pytest.fixture(scope="module")
+def model_files(exported_models):
+    """Randomly initialised DenseNet121 checkpoint + exported Grad-CAM graph"""
+    return exported_models["pth"], exported_models["gradcam_onnx"]
+
+
+@pytest.fixture(scope="module")
+def image_bytes():
+    rng = np.random.default_rng(0)
+    buffered = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (320, 288), dtype=np.uint8), mode="L").save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+@pytest.fixture(scope="module")
+def eager_service(model_files):
+    return GradCAMService(model_files[0], backend="eager")
+
+
+@pytest.mark.parametrize("backend", ["optimized", "onnx"])
+def test_cam_parity_with_pytorch_grad_cam(backend, model_files, eager_service, image_bytes):
+    pth_path, onnx_path = model_files
+    service = GradCAMService(onnx_path if backend == "onnx" else pth_path, backend=backend)
+
+    ref_input, ref_rgb = eager_service.preprocess_image(image_bytes)
+    input_tensor, rgb_img = service.preprocess_image(image_bytes)
+    np.testing.assert_array_equal(rgb_img, ref_rgb)
+
+    for class_idx in [None] + list(range(len(LABELS))):
+        ref_cam, ref_probs, ref_idx = eager_service.compute_cam(ref_input, target_class_idx=class_idx)
+        cam, probs, idx = service.compute_cam(input_tensor, target_class_idx=class_idx)
+
+        assert idx == ref_idx
+        np.testing.assert_allclose(np.asarray(probs), ref_probs.numpy(), atol=1e-5)
+        np.testing.assert_allclose(cam, ref_cam, atol=CAM_TOLERANCE)
+
+
+def test_onnx_generate_gradcam_response(model_files, image_bytes):
+    service = GradCAMService(model_files[1], backend="onnx")
+    result = service.generate_gradcam(image_bytes, target_class_name="Mass")
+
+    assert result["target_class"] == "Mass"
+    assert result["heatmap_base64"].startswith("data:image/png;base64,")
+    assert set(result["all_predictions"]) == set(LABELS)
@@ -0,0 +1,70 @@
+"""
+Memory Profiler Tests
+Per-stage peak tracking and the per-worker budget (trim before recycle)
+"""
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.memory_profiler import MemoryProfiler
+
+
+@pytest.fixture
+def profiler():
+    profiler = MemoryProfiler(enabled=True, check_interval=0)
+    yield profiler
+    profiler.disable()
+
+
+def test_disabled_stage_records_nothing():
+    profiler = MemoryProfiler(enabled=False)
+    with profiler.stage("decode"):
+        np.ones(1024 * 1024)
+    assert profiler.stage_summary() == {}
+    assert not tracemalloc.is_tracing()
+
+
+def test_nested_stage_peaks(profiler):
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            buffer = np.ones(4 * 1024 * 1024 // 8)  # 4 MB, freed before "outer" ends
+            del buffer
+
+    summary = profiler.stage_summary()
+    assert summary["inner"]["python_peak"]["max_mb"] >= 4
+    # The inner reset of the tracemalloc peak must not hide it from the outer stage
+    assert summary["outer"]["python_peak"]["max_mb"] >= 4
+
+
+def test_budget_trims_before_recycling(profiler, monkeypatch):
+    recycled = []
+    monkeypatch.setattr(profiler, "recycle", recycled.append)
+    profiler.budget_mb = 1
+
+    profiler.check_budget()
+    assert profiler.run_options() is not None  # ONNX Runtime arena shrinkage on
+    assert profiler.summary()["trims"] == 1
+    assert recycled == []
+
+    profiler.check_budget()
+    assert len(recycled) == 1
+
+    profiler.budget_mb = 1024 * 1024
+    profiler.check_budget()
+    assert profiler.run_options() is None
+
+
+def test_trim_only_action_never_recycles(monkeypatch):
+    profiler = MemoryProfiler(budget_mb=1, action="trim", check_interval=0)
+    recycled = []
+    monkeypatch.setattr(profiler, "recycle", recycled.append)
+    for _ in range(3):
+        profiler.check_budget()
+    assert recycled == []
+    assert profiler.summary()["trims"] == 1
@@ -1,40 +1,96 @@
 """
 Test Script for Backend Functionality
-Tests model loading and inference without starting the server
+Tests model loading and checks that every preprocessing/inference path
+(codec vs raw pixels, single vs batched, ModelService vs GradCAMService)
+produces the same model input and scores
 """
 import sys
 from pathlib import Path
 
+import numpy as np
+import pytest
+
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.model_service import get_model_service
+from xray_samples import encode_png, synthetic_xray
+
+# Preprocessed inputs are float32 after ImageNet normalization (|x| < ~3)
+INPUT_TOLERANCE = 1e-5
+SCORE_TOLERANCE = 1e-5
+
+# (height, width), dtype: downscaled, non-square, native size, upscaled, 16-bit
+PARITY_FILMS = [
+    ((1024, 1024), np.uint8),
+    ((1536, 1280), np.uint8),
+    ((224, 224), np.uint8),
+    ((160, 200), np.uint8),
+    ((1024, 1024), np.uint16),
+]
+
 
 def test_model_loading():
-    """Test if model loads successfully"""
-    print("=" * 60)
-    print("🧪 TESTING: Model Service Loading")
-    print("=" * 60)
-    
+    """Test if the production model (models/best_model.onnx) loads successfully"""
     try:
         model_service = get_model_service()
-        print("\n✅ Model loaded successfully!")
-        
-        # Get model info
-        info = model_service.get_model_info()
-        print("\n📊 Model Information:")
-        for key, value in info.items():
-            print(f"   {key}: {value}")
-        
-        print("\n✅ Backend is operational and readyfor inference!")
-        return True
-        
-    except Exception as e:
-        print(f"\n❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    except (FileNotFoundError, RuntimeError) as e:
+        pytest.skip(f"Production model not available: {e}")
+
+    info = model_service.get_model_info()
+    print("\n📊 Model Information:")
+    for key, value in info.items():
+        print(f"   {key}: {value}")
+    assert info["num_classes"] == len(info["labels"]) == 13
+
+
+@pytest.mark.parametrize("size,dtype", PARITY_FILMS)
+def test_preprocessing_parity_with_gradcam(size, dtype, model_service, gradcam_onnx_service):
+    """ModelService and GradCAMService must feed the model the same tensor"""
+    image_bytes = encode_png(synthetic_xray(seed=1, size=size, dtype=dtype))
+
+    model_input = model_service.preprocess_image(image_bytes)
+    gradcam_input, _ = gradcam_onnx_service.preprocess_image(image_bytes)
+
+    assert model_input.shape == gradcam_input.shape == (1, 3, 224, 224)
+    np.testing.assert_allclose(gradcam_input, model_input, atol=INPUT_TOLERANCE)
+
+
+def test_gradcam_scores_match_predictions(xray_png, model_service, gradcam_onnx_service):
+    """Grad-CAM reports the same per-label scores and top class as /api/predict"""
+    predictions = model_service.analyze(xray_png, threshold=0.0, cascade=False)["predictions"]
+    scores = {p["label"]: p["score"] for p in predictions}
+
+    gradcam = gradcam_onnx_service.generate_gradcam(xray_png)
+
+    # Compare by label name so a mismatched label order fails
+    assert set(gradcam["all_predictions"]) == set(scores)
+    for label, score in scores.items():
+        assert gradcam["all_predictions"][label] == pytest.approx(score, abs=SCORE_TOLERANCE), label
+    assert gradcam["target_class"] == max(scores, key=scores.get)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+def test_raw_pixels_match_codec(dtype, model_service):
+    """/predict-raw (no codec) scores like /predict on the same film"""
+    image = synthetic_xray(seed=2, dtype=dtype)
+
+    from_png = model_service.analyze(encode_png(image), cascade=False)["probabilities"]
+    from_raw = model_service.analyze_array(image, cascade=False)["probabilities"]
+
+    np.testing.assert_allclose(from_raw, from_png, atol=SCORE_TOLERANCE)
+
+
+def test_batch_matches_single(model_service):
+    """One batched ONNX call scores each film like a single-image call"""
+    images = [synthetic_xray(seed=seed, size=(512, 512)) for seed in range(4)]
+
+    batched = model_service.analyze_batch(images, cascade=False)
+    for image, result in zip(images, batched):
+        single = model_service.analyze_array(image, cascade=False)
+        np.testing.assert_allclose(result["probabilities"], single["probabilities"], atol=SCORE_TOLERANCE)
+        assert result["urgency_tier"] == single["urgency_tier"]
+
 
 if __name__ == "__main__":
-    success = test_model_loading()
-    sys.exit(0 if success else 1)
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,156 @@
+"""
+Model Registry Tests
+Version pinning and draining, activation rules and bounded shadow scoring
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import model_registry
+from app.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def registry(exported_models):
+    """Registry with version "a" ready and active"""
+    registry = ModelRegistry()
+    registry.register("a", exported_models["onnx"], background=False)
+    registry.activate("a")
+    return registry
+
+
+@pytest.fixture
+def load_gate(monkeypatch):
+    """Hold ModelVersion.load until the returned event is set"""
+    gate = threading.Event()
+    original_load = model_registry.ModelVersion.load
+
+    def gated_load(self, *args, **kwargs):
+        gate.wait(timeout=30)
+        original_load(self, *args, **kwargs)
+
+    monkeypatch.setattr(model_registry.ModelVersion, "load", gated_load)
+    yield gate
+    gate.set()
+
+
+def _join_load_thread(name: str):
+    for thread in threading.enumerate():
+        if thread.name == f"load-{name}":
+            thread.join(timeout=30)
+
+
+def test_unload_waits_for_pinned_requests(registry, exported_models):
+    registry.register("b", exported_models["onnx"], background=False)
+
+    with registry.acquire("b"):
+        assert registry.unload("b", drain_timeout=0.1) is False
+
+    assert registry.unload("b", drain_timeout=0.1) is True
+    assert "b" not in [v["version"] for v in registry.describe()["versions"]]
+
+
+def test_unload_returns_once_released(registry, exported_models):
+    registry.register("b", exported_models["onnx"], background=False)
+    pinned, release = threading.Event(), threading.Event()
+
+    def request():
+        with registry.acquire("b"):
+            pinned.set()
+            release.wait(timeout=30)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    pinned.wait(timeout=30)
+    threading.Timer(0.2, release.set).start()
+
+    assert registry.unload("b", drain_timeout=30) is True
+    thread.join()
+
+
+def test_unload_refuses_active_version(registry):
+    with pytest.raises(ValueError):
+        registry.unload("a")
+
+
+def test_activate_refuses_unready_versions(registry, exported_models, tmp_path, load_gate):
+    bad_model = tmp_path / "bad.onnx"
+    bad_model.write_bytes(b"not an onnx graph")
+    load_gate.set()
+    failed = registry.register("failed", str(bad_model), background=False)
+    assert failed.status == "failed"
+    with pytest.raises(ValueError):
+        registry.activate("failed")
+
+    load_gate.clear()
+    loading = registry.register("loading", exported_models["onnx"])
+    assert loading.status == "loading"
+    with pytest.raises(ValueError):
+        registry.activate("loading")
+
+    load_gate.set()
+    _join_load_thread("loading")
+    assert registry.active.name == "a"
+
+
+def test_register_refuses_active_or_loading(registry, exported_models, load_gate):
+    with pytest.raises(ValueError):
+        registry.register("a", exported_models["onnx"], background=False)
+
+    registry.register("b", exported_models["onnx"])
+    with pytest.raises(ValueError):
+        registry.register("b", exported_models["onnx"])
+
+    load_gate.set()
+    _join_load_thread("b")
+
+
+def test_unload_while_loading_does_not_activate(registry, exported_models, load_gate, monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+
+    registry.register("b", exported_models["onnx"], activate=True)
+    assert registry.unload("b", drain_timeout=0.1) is True
+
+    load_gate.set()
+    _join_load_thread("b")
+
+    assert errors == []
+    assert registry.active.name == "a"
+
+
+def test_shadow_drops_while_candidate_busy(registry, exported_models, xray_png, monkeypatch):
+    candidate = registry.register("b", exported_models["onnx"], background=False)
+    registry.set_shadow("b", fraction=1.0)
+    primary = registry.active.service.analyze(xray_png, threshold=0.3, cascade=False)
+
+    started, release = threading.Event(), threading.Event()
+    analyze = candidate.service.analyze
+
+    def blocking_analyze(*args, **kwargs):
+        started.set()
+        release.wait(timeout=30)
+        return analyze(*args, **kwargs)
+
+    monkeypatch.setattr(candidate.service, "analyze", blocking_analyze)
+
+    registry.maybe_shadow(xray_png, 0.3, primary)
+    assert started.wait(timeout=30)
+    registry.maybe_shadow(xray_png, 0.3, primary)  # slot taken: dropped, not queued
+
+    release.set()
+    registry._shadow_executor.submit(lambda: None).result(timeout=30)  # drain the worker
+
+    state = registry.describe()
+    assert state["shadow"]["dropped"] == 1
+    assert state["shadow_stats"]["b"]["requests"] == 1
+
+    # The slot is free again once the shadow run finished
+    registry.maybe_shadow(xray_png, 0.3, primary)
+    registry._shadow_executor.submit(lambda: None).result(timeout=30)
+    assert registry.describe()["shadow_stats"]["b"]["requests"] == 2
@@ -0,0 +1,237 @@
+"""
+Performance Regression Tests
+Latency/throughput budgets for preprocessing, ONNX inference (single and
+batched), Grad-CAM (onnx, eager and optimized backends) and the full FastAPI
+request path (/api/predict, /api/predict-with-gradcam), relative to
+tests/perf_baseline.json
+
+Budgets are scaled by a fixed NumPy/OpenCV calibration workload timed on the
+current machine, so one stored baseline carries across hardware. Refresh it
+after an intentional change with:
+
+    LUNGVISION_PERF_UPDATE_BASELINE=1 pytest tests/test_performance.py
+"""
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from xray_samples import synthetic_xray
+
+pytestmark = pytest.mark.perf
+
+BASELINE_PATH = Path(__file__).parent / "perf_baseline.json"
+UPDATE_BASELINE = os.getenv("LUNGVISION_PERF_UPDATE_BASELINE", "0") == "1"
+
+# Allowed slowdown over the machine-scaled baseline (0.5 = 50% slower). The
+# baseline file's "tolerance" (global or per entry) applies unless overridden here.
+TOLERANCE_OVERRIDE = os.getenv("LUNGVISION_PERF_TOLERANCE")
+DEFAULT_TOLERANCE = 0.5
+
+RUNS = 15
+BATCH_SIZE = 8
+
+
+def _median_ms(fn, runs: int = RUNS, warmup: int = 2) -> float:
+    """Median wall time of `fn()` in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def _calibration_ms() -> float:
+    """Fixed matmul + resize workload used to scale budgets to this machine"""
+    matrix = np.random.default_rng(0).random((384, 384), dtype=np.float32)
+    image = synthetic_xray()
+
+    def workload():
+        for _ in range(8):
+            matrix @ matrix
+            cv2.resize(image, (224, 224), interpolation=cv2.INTER_LINEAR)
+
+    return _median_ms(workload, runs=21)
+
+
+class PerfBaseline:
+    """Stored budgets scaled to this machine; collects measurements for updates"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = json.loads(path.read_text()) if path.exists() else {"budgets": {}}
+        self.calibration_ms = _calibration_ms()
+        stored = self.data.get("calibration_ms")
+        self.scale = self.calibration_ms / stored if stored else 1.0
+        self.measured = {}
+
+    def _tolerance(self, entry: dict) -> float:
+        if TOLERANCE_OVERRIDE:
+            return float(TOLERANCE_OVERRIDE)
+        return entry.get("tolerance", self.data.get("tolerance", DEFAULT_TOLERANCE))
+
+    def _entry(self, name: str, key: str):
+        if UPDATE_BASELINE:
+            return None
+        entry = self.data["budgets"].get(name)
+        if entry is None or key not in entry:
+            pytest.skip(f"No baseline for {name}; run with LUNGVISION_PERF_UPDATE_BASELINE=1")
+        return entry
+
+    def check_latency(self, name: str, measured_ms: float):
+        """Fail if `measured_ms` exceeds the scaled baseline plus tolerance"""
+        self.measured.setdefault(name, {})["ms"] = round(measured_ms, 3)
+        entry = self._entry(name, "ms")
+        if entry is None:
+            return
+        tolerance = self._tolerance(entry)
+        limit = entry["ms"] * self.scale * (1 + tolerance)
+        assert measured_ms <= limit, (
+            f"{name}: {measured_ms:.2f} ms over budget {limit:.2f} ms "
+            f"(baseline {entry['ms']:.2f} ms x machine scale {self.scale:.2f}, +{tolerance:.0%})"
+        )
+
+    def check_throughput(self, name: str, measured_per_s: float):
+        """Fail if `measured_per_s` falls below the scaled baseline minus tolerance"""
+        self.measured.setdefault(name, {})["per_s"] = round(measured_per_s, 2)
+        entry = self._entry(name, "per_s")
+        if entry is None:
+            return
+        tolerance = self._tolerance(entry)
+        floor = entry["per_s"] / self.scale / (1 + tolerance)
+        assert measured_per_s >= floor, (
+            f"{name}: {measured_per_s:.1f}/s under budget {floor:.1f}/s "
+            f"(baseline {entry['per_s']:.1f}/s / machine scale {self.scale:.2f}, -{tolerance:.0%})"
+        )
+
+    def save(self):
+        """Write the measurements (and this machine's calibration) as the new baseline"""
+        budgets = self.data.setdefault("budgets", {})
+        for name, values in self.measured.items():
+            budgets.setdefault(name, {}).update(values)
+        self.data.update({
+            "calibration_ms": round(self.calibration_ms, 3),
+            "tolerance": self.data.get("tolerance", DEFAULT_TOLERANCE),
+            "machine": {
+                "platform": platform.platform(),
+                "processor": platform.processor() or platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "python": platform.python_version(),
+                "onnxruntime": ort.__version__,
+            },
+        })
+        self.path.write_text(json.dumps(self.data, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="module")
+def perf_baseline():
+    baseline = PerfBaseline(BASELINE_PATH)
+    yield baseline
+    if UPDATE_BASELINE:
+        baseline.save()
+
+
+def test_preprocess_model_service(xray_png, model_service, perf_baseline):
+    """PNG decode + resize + normalize of a 1024x1024 film (/api/predict path)"""
+    perf_baseline.check_latency(
+        "preprocess:model_service",
+        _median_ms(lambda: model_service.preprocess_image(xray_png))
+    )
+
+
+def test_preprocess_gradcam(xray_png, gradcam_onnx_service, perf_baseline):
+    """Same film through GradCAMService.preprocess_image (Grad-CAM path)"""
+    perf_baseline.check_latency(
+        "preprocess:gradcam",
+        _median_ms(lambda: gradcam_onnx_service.preprocess_image(xray_png))
+    )
+
+
+def test_onnx_single(xray_png, model_service, perf_baseline):
+    """One (1, 3, 224, 224) forward of the classifier"""
+    input_array = model_service.preprocess_image(xray_png)
+    perf_baseline.check_latency(
+        "onnx:single",
+        _median_ms(lambda: model_service._full_logits(input_array))
+    )
+
+
+def test_onnx_batched(xray_png, model_service, perf_baseline):
+    """One batched forward; throughput in images per second"""
+    batch = np.repeat(model_service.preprocess_image(xray_png), BATCH_SIZE, axis=0)
+    batch_ms = _median_ms(lambda: model_service._full_logits(batch))
+    perf_baseline.check_latency(f"onnx:batch{BATCH_SIZE}", batch_ms)
+    perf_baseline.check_throughput(f"onnx:batch{BATCH_SIZE}", BATCH_SIZE * 1000 / batch_ms)
+
+
+def test_gradcam_onnx(xray_png, gradcam_onnx_service, perf_baseline):
+    """Full Grad-CAM response (preprocess, CAM, overlay, PNG/base64) on ONNX Runtime"""
+    perf_baseline.check_latency(
+        "gradcam:onnx",
+        _median_ms(lambda: gradcam_onnx_service.generate_gradcam(xray_png), runs=7)
+    )
+
+
+@pytest.fixture(scope="module")
+def gradcam_torch_service(exported_models):
+    """Grad-CAM on the session .pth with a PyTorch backend (eager needs pytorch_grad_cam)"""
+    services = {}
+
+    def get(backend: str):
+        if backend == "eager":
+            pytest.importorskip("pytorch_grad_cam")
+        if backend not in services:
+            from app.gradcam_service import GradCAMService
+            services[backend] = GradCAMService(exported_models["pth"], backend=backend)
+        return services[backend]
+    return get
+
+
+@pytest.mark.parametrize("backend", ["eager", "optimized"])
+def test_gradcam_torch(backend, xray_png, gradcam_torch_service, perf_baseline):
+    """Full Grad-CAM response on the PyTorch backends (eager is the production default)"""
+    service = gradcam_torch_service(backend)
+    perf_baseline.check_latency(
+        f"gradcam:{backend}",
+        _median_ms(lambda: service.generate_gradcam(xray_png), runs=5)
+    )
+
+
+def test_api_predict(xray_png, api_client, perf_baseline):
+    """POST /api/predict end to end (multipart, validation, inference, serialization)"""
+    def request():
+        response = api_client.post("/api/predict", files={"file": ("xray.png", xray_png, "image/png")})
+        assert response.status_code == 200, response.text
+
+    perf_baseline.check_latency("api:predict", _median_ms(request))
+
+    start_time = time.perf_counter()
+    for _ in range(RUNS):
+        request()
+    perf_baseline.check_throughput("api:predict", RUNS / (time.perf_counter() - start_time))
+
+
+def test_api_predict_with_gradcam(xray_png, api_client, perf_baseline):
+    """POST /api/predict-with-gradcam end to end (inference, Grad-CAM, heatmap encoding)"""
+    def request():
+        response = api_client.post(
+            "/api/predict-with-gradcam",
+            files={"file": ("xray.png", xray_png, "image/png")}
+        )
+        assert response.status_code == 200, response.text
+
+    perf_baseline.check_latency("api:predict-with-gradcam", _median_ms(request, runs=7))
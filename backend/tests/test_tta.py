@@ -0,0 +1,128 @@
+"""
+Test-Time Augmentation Tests
+Band gating in 'auto' mode, the batched views and reuse of first-pass logits
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.model_service import ModelService, LABELS, URGENCY_TIERS
+from xray_samples import synthetic_xray
+
+SCORE_TOLERANCE = 1e-5
+NUM_VIEWS = 4  # identity, hflip, scale_240, scale_256
+
+
+@pytest.fixture(scope="module")
+def image():
+    return synthetic_xray(seed=3, size=(512, 512))
+
+
+@pytest.fixture
+def make_service(exported_models):
+    def make(**kwargs):
+        return ModelService(exported_models["onnx"], **kwargs)
+    return make
+
+
+@pytest.fixture
+def forward_batches(monkeypatch):
+    """Spy on ModelService._full_logits; returns a function recording batch sizes"""
+    def spy(service):
+        sizes = []
+        full_logits = service._full_logits
+
+        def recording(input_array):
+            sizes.append(input_array.shape[0])
+            return full_logits(input_array)
+
+        monkeypatch.setattr(service, "_full_logits", recording)
+        return sizes
+    return spy
+
+
+def _critical_band(probabilities: np.ndarray, margin: float = 1e-3):
+    """A band just wide enough to contain every critical-tier first-pass score"""
+    critical = [p for label, p in zip(LABELS, probabilities) if URGENCY_TIERS[label] == "critical"]
+    return max(0.0, min(critical) - margin), min(1.0, max(critical) + margin)
+
+
+def test_needs_tta_only_inside_band(make_service):
+    service = make_service(tta_band=(0.3, 0.7), tta_tiers=("critical",))
+    scores = np.zeros(len(LABELS), dtype=np.float32)
+
+    assert not service._needs_tta(scores)
+    scores[LABELS.index("Mass")] = 0.5  # critical, inside
+    assert service._needs_tta(scores)
+    scores[LABELS.index("Mass")] = 0.9  # critical, above the band
+    assert not service._needs_tta(scores)
+    scores[LABELS.index("Pneumonia")] = 0.5  # inside, but moderate tier
+    assert not service._needs_tta(scores)
+
+
+def test_auto_skips_outside_band(make_service, image, forward_batches):
+    service = make_service()
+    probabilities = service.analyze_array(image, cascade=False)["probabilities"]
+    low, high = _critical_band(probabilities)
+
+    # A band above every critical score: single forward only
+    service = make_service(tta_band=(min(1.0, high + 0.01), 1.0))
+    sizes = forward_batches(service)
+    result = service.analyze_array(image, cascade=False, tta="auto")
+    assert result["tta_applied"] is False
+    assert result["uncertainty"] is None
+    assert sizes == [1]
+
+
+def test_auto_reuses_identity_logits(make_service, image, forward_batches):
+    service = make_service()
+    first_pass = service.analyze_array(image, cascade=False)["probabilities"]
+
+    service = make_service(tta_band=_critical_band(first_pass))
+    sizes = forward_batches(service)
+    result = service.analyze_array(image, cascade=False, tta="auto")
+
+    assert result["tta_applied"] is True
+    assert result["uncertainty"]["num_views"] == NUM_VIEWS
+    assert set(result["uncertainty"]["variance"]) == set(LABELS)
+    # First pass scores the identity view; the TTA call only adds the other views
+    assert sizes == [1, NUM_VIEWS - 1]
+
+
+def test_tta_batch_views(make_service, image):
+    service = make_service()
+    rgb = service._to_rgb(image)
+
+    batch = service._build_tta_batch(rgb)
+    base = service._transform_array(rgb, service.transform)[0]
+    assert batch.shape == (NUM_VIEWS, 3, 224, 224)
+    assert batch.dtype == np.float32
+    np.testing.assert_array_equal(batch[0], base)
+    np.testing.assert_array_equal(batch[1], base[:, :, ::-1])
+
+    without_identity = service._build_tta_batch(rgb, include_identity=False)
+    np.testing.assert_array_equal(without_identity, batch[1:])
+
+
+def test_always_matches_manual_mean(make_service, image, forward_batches):
+    service = make_service()
+    batch = service._build_tta_batch(service._to_rgb(image))
+    view_logits = service._full_logits(batch)
+    expected = service._sigmoid(view_logits.mean(axis=0))
+
+    sizes = forward_batches(service)
+    result = service.analyze_array(image, cascade=False, tta="always")
+
+    assert sizes == [NUM_VIEWS]  # one batched call, no separate first pass
+    assert result["uncertainty"]["num_views"] == NUM_VIEWS
+    np.testing.assert_allclose(result["probabilities"], expected, atol=SCORE_TOLERANCE)
+
+    # 'auto' (identity from the first pass) aggregates to the same scores
+    auto_service = make_service(tta_band=_critical_band(expected, margin=1.0))
+    auto = auto_service.analyze_array(image, cascade=False, tta="auto")
+    np.testing.assert_allclose(auto["probabilities"], expected, atol=SCORE_TOLERANCE)
@@ -0,0 +1,61 @@
+"""
+Synthetic Chest X-Ray Helpers
+Deterministic test films (shared by the fixtures in conftest.py and the tests)
+"""
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def synthetic_xray(seed: int = 0, size=(1024, 1024), dtype=np.uint8) -> np.ndarray:
+    """
+    Generate a grayscale frontal chest X-ray look-alike
+
+    Body outline, dark lung fields, bright mediastinum/spine, rib arcs, a
+    random nodule, blur and quantum noise, so codecs, resizing and the model
+    see realistic structure rather than uniform noise.
+
+    Args:
+        seed: RNG seed (same seed, same film)
+        size: (height, width)
+        dtype: np.uint8 or np.uint16
+
+    Returns:
+        Array (height, width) of `dtype`
+    """
+    rng = np.random.default_rng(seed)
+    height, width = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    y /= height
+    x /= width
+
+    image = np.full(size, 0.08, dtype=np.float32)
+    body = ((x - 0.5) / 0.46) ** 2 + ((y - 0.58) / 0.58) ** 2 < 1
+    image[body] = 0.55
+    for center in (0.32, 0.68):
+        lungs = ((x - center) / 0.15) ** 2 + ((y - 0.5) / 0.32) ** 2 < 1
+        image[lungs] = 0.22
+    image[(np.abs(x - 0.5) < 0.05 + 0.05 * y) & body] = 0.8
+
+    # Ribs: bright arcs sagging towards the sides
+    ribs = np.sin(2 * np.pi * (9 * y - 2.5 * (x - 0.5) ** 2))
+    image += 0.12 * (ribs > 0.7) * body
+
+    # One nodule at a random position in a lung field
+    cx = rng.choice([0.32, 0.68]) + rng.uniform(-0.06, 0.06)
+    cy = rng.uniform(0.35, 0.65)
+    radius = rng.uniform(0.01, 0.03)
+    image += 0.3 * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2))
+
+    image = cv2.GaussianBlur(image, (0, 0), max(height, width) / 512)
+    image += rng.normal(0, 0.02, size).astype(np.float32)
+    return (np.clip(image, 0, 1) * np.iinfo(dtype).max).astype(dtype)
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """PNG-encode a grayscale uint8/uint16 array"""
+    buffered = io.BytesIO()
+    Image.fromarray(image).save(buffered, format="PNG")
+    return buffered.getvalue()